@@ -1,29 +1,51 @@
 from __future__ import annotations
 
+import atexit
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Any
 
-from flask import Flask, jsonify, request, send_from_directory
+import numpy as np
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
 from pymongo import MongoClient
 
+from blob_store import build_blob_store, sniff_mimetype
 from config import BACKEND_DIR, get_settings
 from db import PredictionStore
+from db_indexes import ensure_indexes
 from inference import (
+    ClassifierResult,
+    FRUIT_CLASSES,
+    LEAF_CLASSES,
     HeuristicFruitClassifier,
     HeuristicLeafClassifier,
-    KerasClassifier,
+    MicroBatcher,
+    build_classifier,
 )
+from model_server import RemoteClassifier
+from models.product import backfill_search_tokens
+from prediction_cache import PredictionCache
 from recommendation import recommend
+from tta import TTAugmenter
 from utils_image import (
+    ENHANCEMENT_MODES,
+    ENHANCEMENT_PRESETS,
+    ImageAnalysis,
+    analyze_image,
     decode_data_url,
-    decode_image_bytes,
-    extract_features,
-    resize_for_model,
+    decode_image_for_analysis,
+    enhanced_model_input,
+    enhancement_applies,
+    prepare_model_inputs,
     safe_json,
     sha256_bytes,
-    assess_image_quality,
-    enhance_image_for_detection,
 )
 
 # Import route blueprints
@@ -74,28 +96,20 @@ def init_database():
             app.config['db_orders'] = db['orders']
             app.config['db_reviews'] = db['reviews']
             
-            # Create indexes for better performance
-            app.config['db_users'].create_index('email', unique=True)
-            app.config['db_products'].create_index([('name', 'text'), ('description', 'text')])
-            app.config['db_products'].create_index('category')
-            app.config['db_products'].create_index('is_active')
-            app.config['db_orders'].create_index('user_id')
-            app.config['db_orders'].create_index('status')
-            app.config['db_reviews'].create_index('product_id')
-            app.config['db_reviews'].create_index('user_id')
-            
-            # Forum collection
             app.config['db_forum'] = db['forum']
-            app.config['db_forum'].create_index('category')
-            app.config['db_forum'].create_index('is_published')
-            app.config['db_forum'].create_index([('title', 'text'), ('content', 'text')])
+            app.config['db_harvest_pins'] = db['harvest_pins']  # Harvest Map
             
-            # Harvest pins collection (Harvest Map)
-            app.config['db_harvest_pins'] = db['harvest_pins']
-            app.config['db_harvest_pins'].create_index([('latitude', 1), ('longitude', 1)])
-            app.config['db_harvest_pins'].create_index('pin_type')
-            app.config['db_harvest_pins'].create_index('is_active')
-            app.config['db_harvest_pins'].create_index('created_by')
+            # Compound indexes per route query shape (see db_indexes.py)
+            index_result = ensure_indexes(db)
+            for name in index_result['replaced']:
+                print(f"✓ Rebuilding text index {name} with the current fields")
+            if index_result['created']:
+                print(f"✓ Created {len(index_result['created'])} MongoDB indexes")
+            for conflict in index_result['conflicts']:
+                print(f"✗ Index conflict {conflict}")
+            backfilled = backfill_search_tokens(app.config['db_products'])
+            if backfilled:
+                print(f"✓ Added search tokens to {backfilled} products")
             
             print("✓ MongoDB collections initialized successfully")
         except Exception as e:
@@ -143,15 +157,110 @@ app.register_blueprint(forum_bp)
 app.register_blueprint(chatbot_bp)
 app.register_blueprint(heatmap_bp)
 
-store = PredictionStore(settings.mongodb_uri, settings.mongodb_db, settings.mongodb_collection)
+store = PredictionStore(
+    settings.mongodb_uri,
+    settings.mongodb_db,
+    settings.mongodb_collection,
+    write_behind=settings.prediction_write_behind,
+    queue_size=settings.prediction_write_queue_size,
+    batch_size=settings.prediction_write_batch_size,
+    flush_interval=settings.prediction_write_interval_ms / 1000.0,
+)
+# Flush any queued prediction records before the process exits
+atexit.register(store.close)
+
+# Scan images live outside MongoDB; prediction records only carry their sha256
+blob_store = build_blob_store(settings)
+
+
+# If you have trained models, drop them in backend/model/ and set FRUIT_MODEL_PATH / LEAF_MODEL_PATH.
+# With MODEL_SERVER_ADDRESS set, inference runs in a separate model_server.py process instead.
+if settings.model_server_address:
+    fruit_model = RemoteClassifier(settings.model_server_address, "fruit", FRUIT_CLASSES, settings.model_server_authkey)
+    leaf_model = RemoteClassifier(settings.model_server_address, "leaf", LEAF_CLASSES, settings.model_server_authkey)
+else:
+    fruit_model = build_classifier(settings, "fruit")
+    leaf_model = build_classifier(settings, "leaf")
 
-# If you have trained models, drop them in backend/model/ and set FRUIT_MODEL_PATH / LEAF_MODEL_PATH
-fruit_model = KerasClassifier(settings.fruit_model_path, classes=["good", "mold", "overripe", "ripe", "unripe"])
-leaf_model = KerasClassifier(settings.leaf_model_path, classes=["healthy", "mold"])
+# Fail at startup rather than on the first scan
+if settings.enhancement_preset not in ENHANCEMENT_PRESETS:
+    raise ValueError(f"ENHANCEMENT_PRESET must be one of {ENHANCEMENT_PRESETS}, got {settings.enhancement_preset!r}")
+if settings.enhancement_mode not in ENHANCEMENT_MODES:
+    raise ValueError(f"ENHANCEMENT_MODE must be one of {ENHANCEMENT_MODES}, got {settings.enhancement_mode!r}")
+for _name, _threshold, _classes in (
+    ("CASCADE_FRUIT_THRESHOLD", settings.cascade_fruit_threshold, FRUIT_CLASSES),
+    ("CASCADE_LEAF_THRESHOLD", settings.cascade_leaf_threshold, LEAF_CLASSES),
+):
+    # Top-1 confidence is never below chance, so such a threshold would never escalate
+    if settings.inference_cascade and _threshold <= 1.0 / len(_classes):
+        raise ValueError(f"{_name} must be above 1/{len(_classes)} to ever trigger, got {_threshold}")
+
+# With TTA enabled its variants replace the original/enhanced pair (and the cascade)
+tta = (
+    TTAugmenter(
+        settings.tta_variants,
+        aggregation=settings.tta_aggregation,
+        crop_fraction=settings.tta_crop_fraction,
+        enhancement_preset=settings.enhancement_preset,
+        working_size=settings.enhancement_working_size,
+    )
+    if settings.tta_variants
+    else None
+)
 
 fruit_fallback = HeuristicFruitClassifier()
 leaf_fallback = HeuristicLeafClassifier()
 
+prediction_cache = (
+    PredictionCache(
+        max_entries=settings.prediction_cache_max_entries,
+        max_bytes=settings.prediction_cache_max_bytes,
+        ttl_seconds=settings.prediction_cache_ttl_seconds,
+    )
+    if settings.prediction_cache
+    else None
+)
+
+# Response fields that are stored on the prediction record and can be served back from it
+CACHED_RESPONSE_FIELDS = (
+    "result", "confidence", "is_bignay", "detection", "subject", "image_sha256", "fruit", "leaf",
+    "image_quality", "color", "size", "recommendation", "debug",
+)
+# Record-only fields a cache hit needs to persist its own prediction record
+CACHED_RECORD_FIELDS = ("image_dhash", "fruit", "leaf")
+
+# Startup report for MODEL_WARMUP; without warm-up models load lazily and the app is ready at once
+startup_report: dict[str, Any] = {
+    "warmup": settings.model_warmup,
+    "ready": not settings.model_warmup,
+    "models": {},
+    "error": None,
+    "total_ms": None,
+}
+
+
+def _warm_up_models() -> None:
+    """Load both models and run a dummy inference so the first real request is fast."""
+    start = time.perf_counter()
+    try:
+        for name, model in (("fruit", fruit_model), ("leaf", leaf_model)):
+            if not model.available():
+                startup_report["models"][name] = {"skipped": "model not available, using heuristics"}
+                continue
+            timings = model.warm_up()
+            startup_report["models"][name] = {k: round(v, 1) for k, v in timings.items()}
+            print(f"✓ {name} model warmed up: {startup_report['models'][name]}")
+        startup_report["ready"] = True
+    except Exception as e:  # pylint: disable=broad-except
+        startup_report["error"] = str(e)
+        print(f"✗ Model warm-up failed: {e}")
+    finally:
+        startup_report["total_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+
+
+if settings.model_warmup:
+    threading.Thread(target=_warm_up_models, name="model-warmup", daemon=True).start()
+
 # Confidence threshold for Bignay detection
 # Balance between accepting blurry/distant bignay and rejecting non-bignay items
 BIGNAY_CONFIDENCE_THRESHOLD = 0.45  # Main threshold for confident detection
@@ -313,17 +422,79 @@ def _quality_from_fruit_class(fruit_class: str) -> str | None:
     return None
 
 
-def _mold_flag_from_image(image_bgr) -> bool:
-    # Conservative classical heuristic: if too many pixels are very dark and low saturation.
-    import cv2
-    import numpy as np
+def _pipeline_fingerprint() -> str:
+    """Short hash of the settings that change predictions for the same image and model files."""
+    pipeline = {
+        "inference_backend": settings.inference_backend,
+        "tflite_variant": settings.tflite_variant,
+        "model_calibration": settings.model_calibration,
+        "analysis_max_side": settings.analysis_max_side,
+        "enhancement_preset": settings.enhancement_preset,
+        "enhancement_mode": settings.enhancement_mode,
+        "enhancement_working_size": settings.enhancement_working_size,
+        "inference_cascade": settings.inference_cascade,
+        "cascade_fruit_threshold": settings.cascade_fruit_threshold,
+        "cascade_leaf_threshold": settings.cascade_leaf_threshold,
+        "tta_variants": list(settings.tta_variants),
+        "tta_aggregation": settings.tta_aggregation,
+        "tta_crop_fraction": settings.tta_crop_fraction,
+    }
+    body = json.dumps(pipeline, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()[:12]
+
+
+PIPELINE_FINGERPRINT = _pipeline_fingerprint()
+
 
-    hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
-    s = hsv[:, :, 1]
-    v = hsv[:, :, 2]
-    moldish = (v < 55) & (s < 85)
-    ratio = float(np.mean(moldish))
-    return ratio > 0.22
+def _model_version(subject: str) -> str:
+    """Cache-key component that changes whenever the model or the pipeline serving this subject does."""
+    model = fruit_model if subject == "fruit" else leaf_model
+    if not model.available():
+        return f"heuristic:{PIPELINE_FINGERPRINT}"
+    try:
+        # Local classifiers stat their own files; RemoteClassifier asks the model server once
+        version = model.version()
+    except (OSError, EOFError, RuntimeError):
+        return f"heuristic:{PIPELINE_FINGERPRINT}"
+    return f"{version}:{PIPELINE_FINGERPRINT}"
+
+
+def _cached_prediction(
+    image_sha256: str, subject: str, model_version: str
+) -> tuple[dict[str, Any], dict[str, Any]] | None:
+    """
+    Look up a previous result for the same image, from memory first and then MongoDB.
+    Returns (response, record fields) so the hit can still be persisted as its own scan.
+    """
+    if prediction_cache is None:
+        return None
+    key = (image_sha256, subject, model_version)
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        response = {field: cached[field] for field in CACHED_RESPONSE_FIELDS}
+        response["debug"] = {**cached["debug"], "cache": "memory"}
+        return response, cached["record"]
+
+    if not (settings.prediction_cache_db_tier and store.enabled):
+        return None
+    try:
+        doc = store.find_recent_prediction(
+            image_sha256, subject, model_version, settings.prediction_cache_ttl_seconds
+        )
+    except Exception:  # pylint: disable=broad-except
+        return None
+    if doc is None or not all(field in doc for field in CACHED_RESPONSE_FIELDS):
+        return None
+    cached = {field: doc[field] for field in CACHED_RESPONSE_FIELDS}
+    cached["record"] = {field: doc.get(field) for field in CACHED_RECORD_FIELDS}
+    if not cached["is_bignay"]:
+        # Records keep the raw model output; the response hides it for non-Bignay images
+        cached["fruit"] = cached["leaf"] = None
+    prediction_cache.put(key, cached)
+    prediction_cache.record_db_hit()
+    response = {field: cached[field] for field in CACHED_RESPONSE_FIELDS}
+    response["debug"] = {**cached["debug"], "cache": "db"}
+    return response, cached["record"]
 
 
 @app.get("/")
@@ -350,7 +521,10 @@ def api_info():
             "routes": {
                 "ui": "/",
                 "health": "/health",
+                "liveness": "/health/live",
+                "readiness": "/health/ready",
                 "predict": "/predict",
+                "predict_batch": "/predict/batch",
                 "predictions": "/predictions",
             },
         }
@@ -360,80 +534,253 @@ def api_info():
 @app.get("/health")
 def health():
     db_status = store.status()
+    models: dict[str, Any] = {
+        "fruit": {"path": str(settings.fruit_model_path), "available": fruit_model.available()},
+        "leaf": {"path": str(settings.leaf_model_path), "available": leaf_model.available()},
+    }
+    if isinstance(fruit_model, MicroBatcher):
+        models["fruit"]["batching"] = fruit_model.stats()
+    if isinstance(leaf_model, MicroBatcher):
+        models["leaf"]["batching"] = leaf_model.stats()
     return jsonify(
         {
             "ok": True,
+            "ready": startup_report["ready"],
             "time": datetime.now(timezone.utc).isoformat(),
-            "models": {
-                "fruit": {"path": str(settings.fruit_model_path), "available": fruit_model.available()},
-                "leaf": {"path": str(settings.leaf_model_path), "available": leaf_model.available()},
+            "models": models,
+            "inference_backend": settings.inference_backend,
+            "model_server": settings.model_server_address,
+            "startup": startup_report,
+            "db": {
+                "enabled": db_status.enabled,
+                "ok": db_status.ok,
+                "message": db_status.message,
+                "writes": store.write_stats(),
             },
-            "db": {"enabled": db_status.enabled, "ok": db_status.ok, "message": db_status.message},
+            "blob_store": blob_store.stats() if blob_store is not None else {"backend": "none"},
+            "prediction_cache": prediction_cache.stats() if prediction_cache is not None else None,
         }
     )
 
-@app.post("/predict")
-def predict():
-    body: dict[str, Any] = request.get_json(force=True, silent=False)
-    if "image" not in body:
-        return jsonify({"error": "Missing 'image' field"}), 400
 
-    subject = str(body.get("subject", "fruit")).strip().lower()
-    if subject not in {"fruit", "leaf"}:
-        return jsonify({"error": "Invalid 'subject'. Use 'fruit' or 'leaf'."}), 400
+@app.get("/health/live")
+def health_live():
+    # Liveness: the process is up and serving requests
+    return jsonify({"ok": True})
 
-    data_url = body["image"]
-    img_bytes = decode_data_url(data_url)
-    image_sha256 = sha256_bytes(img_bytes)
-    image_bgr = decode_image_bytes(img_bytes)
 
-    # Extract features for quality assessment
-    features = extract_features(image_bgr)
-    
-    # Assess image quality first
-    image_quality = assess_image_quality(image_bgr, features.mask_coverage)
-    
-    # Apply image enhancement for better detection of blurry/distant images
-    enhanced_image = enhance_image_for_detection(image_bgr)
-    
-    mold_heuristic = _mold_flag_from_image(image_bgr)
+@app.get("/health/ready")
+def health_ready():
+    # Readiness: models are loaded and warm (always true when MODEL_WARMUP is off)
+    ready = bool(startup_report["ready"])
+    return jsonify({"ready": ready, "startup": startup_report}), (200 if ready else 503)
 
-    # Model inference with enhanced image for better detection
-    # Try both original and enhanced image, use the one with higher confidence
-    input_tensor_original = resize_for_model(image_bgr, 224)
-    input_tensor_enhanced = resize_for_model(enhanced_image, 224)
+def _truthy(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes", "y", "on"}
+    return bool(value)
 
-    fruit_pred = None
-    leaf_pred = None
-    used_enhanced = False
 
-    if subject == "fruit":
-        if fruit_model.available():
-            # Try both original and enhanced, use best result
-            pred_original = fruit_model.predict(input_tensor_original)
-            pred_enhanced = fruit_model.predict(input_tensor_enhanced)
-            
-            # Use the prediction with higher confidence
-            if pred_enhanced.confidence > pred_original.confidence:
-                fruit_pred = pred_enhanced
-                used_enhanced = True
-            else:
-                fruit_pred = pred_original
-        else:
-            fruit_pred = fruit_fallback.predict_from_features(features)
+def _read_predict_upload() -> tuple[bytes, str, bool, str]:
+    """
+    Pull the image bytes and options out of a /predict request.
+
+    Accepts three body types:
+    - multipart/form-data: file part "image", optional form fields "subject"/"store_image"
+    - application/octet-stream or image/*: raw image bytes, options as query parameters
+    - JSON (default): {"image": "<data URL>", "subject": ..., "store_image": ...}
+
+    Binary bodies are read once into a single bytes buffer that goes straight to
+    np.frombuffer/cv2.imdecode, skipping the JSON parse and base64 copy.
+    Returns (img_bytes, subject, store_image, mimetype); raises ValueError on bad input.
+    """
+    mimetype = request.mimetype or ""
+
+    if mimetype == "multipart/form-data":
+        upload = request.files.get("image")
+        if upload is None:
+            raise ValueError("Missing 'image' file part")
+        img_bytes = upload.read()
+        options: Any = request.form
+        image_mimetype = upload.mimetype or "image/jpeg"
+    elif mimetype == "application/octet-stream" or mimetype.startswith("image/"):
+        img_bytes = request.get_data(cache=False)
+        options = request.args
+        image_mimetype = mimetype if mimetype.startswith("image/") else "image/jpeg"
     else:
-        if leaf_model.available():
-            # Try both original and enhanced, use best result
-            pred_original = leaf_model.predict(input_tensor_original)
-            pred_enhanced = leaf_model.predict(input_tensor_enhanced)
-            
-            if pred_enhanced.confidence > pred_original.confidence:
-                leaf_pred = pred_enhanced
-                used_enhanced = True
-            else:
-                leaf_pred = pred_original
+        body: dict[str, Any] = request.get_json(force=True, silent=False)
+        if "image" not in body:
+            raise ValueError("Missing 'image' field")
+        data_url = body["image"]
+        img_bytes = decode_data_url(data_url)
+        options = body
+        header = data_url[:data_url.find(",")]
+        image_mimetype = header[5:].split(";", 1)[0] if header.startswith("data:") else ""
+        image_mimetype = image_mimetype or "image/jpeg"
+
+    if not img_bytes:
+        raise ValueError("Empty image upload")
+
+    subject = str(options.get("subject", "fruit")).strip().lower()
+    return img_bytes, subject, _truthy(options.get("store_image", False)), image_mimetype
+
+
+@dataclass
+class _PreparedScan:
+    """Per-image work done before inference: analysis plus the stacked model inputs."""
+    image_sha256: str
+    analysis: ImageAnalysis
+    tensors: np.ndarray  # (1 or 2, 224, 224, 3): original[, enhanced], or one row per TTA variant
+    enhancement: str  # preset applied, "skipped", "off" or "deferred" (cascade, not yet decided)
+    # Analysis frame kept only while a cascade second pass may still need it
+    image_bgr: np.ndarray | None = None
+    # "parallel", "original", "cascade_confident", "cascade_second_pass", "tta" or "heuristic"
+    inference_path: str = ""
+    tta: dict[str, Any] | None = None
+
+
+def _prepare_scan(img_bytes: bytes, image_sha256: str) -> _PreparedScan:
+    # Decode straight to the analysis resolution; the model only ever sees 224x224
+    image_bgr, pixel_scale = decode_image_for_analysis(img_bytes, settings.analysis_max_side)
+
+    # Features, quality assessment and mold heuristic from one shared set of colour conversions
+    analysis = analyze_image(image_bgr, image_sha256, pixel_scale=pixel_scale, perceptual_hash="dhash")
+
+    if tta is not None:
+        if "enhanced" not in tta.variants:
+            enhance, enhancement = False, "off"
         else:
-            leaf_pred = leaf_fallback.predict_from_features(features)
+            # Same ENHANCEMENT_PRESET/MODE gate as the original/enhanced pair
+            enhance = enhancement_applies(analysis.quality, settings.enhancement_preset, settings.enhancement_mode)
+            enhancement = settings.enhancement_preset if enhance else "skipped"
+        return _PreparedScan(
+            image_sha256=image_sha256,
+            analysis=analysis,
+            tensors=tta.build_batch(image_bgr, enhance=enhance),
+            enhancement=enhancement,
+        )
+
+    if settings.inference_cascade and enhancement_applies(
+        analysis.quality, settings.enhancement_preset, settings.enhancement_mode
+    ):
+        # Only the original is scored up front; _run_inference enhances it if that isn't confident
+        tensors, _ = prepare_model_inputs(image_bgr, analysis.quality, preset="off")
+        return _PreparedScan(
+            image_sha256=image_sha256, analysis=analysis, tensors=tensors, enhancement="deferred", image_bgr=image_bgr
+        )
+
+    # Original plus (per ENHANCEMENT_*) an enhanced copy for blurry/distant images;
+    # the more confident of the two predictions is used
+    tensors, enhancement = prepare_model_inputs(
+        image_bgr,
+        analysis.quality,
+        preset=settings.enhancement_preset,
+        mode=settings.enhancement_mode,
+        working_size=settings.enhancement_working_size,
+    )
+    return _PreparedScan(image_sha256=image_sha256, analysis=analysis, tensors=tensors, enhancement=enhancement)
+
+
+def _run_inference(subject: str, model: Any, scans: list[_PreparedScan]) -> list[list[Any] | None]:
+    """
+    Model rows for each scan (None without a model), sets each scan's inference_path.
+    All prepared rows go through one forward pass; with INFERENCE_CASCADE, scans whose
+    original scored below CASCADE_FRUIT_THRESHOLD / CASCADE_LEAF_THRESHOLD are enhanced
+    and re-run together.
+    """
+    if not model.available():
+        for scan in scans:
+            scan.inference_path = "heuristic"
+            if scan.enhancement == "deferred":
+                scan.enhancement = "skipped"
+            scan.image_bgr = None
+        return [None] * len(scans)
+
+    if tta is not None:
+        # All variants of all scans in one forward pass; softmax rows are aggregated per scan
+        probs = model.predict_proba(np.concatenate([scan.tensors for scan in scans], axis=0))
+        combined = tta.aggregate_batch(probs, model.classes, [scan.tensors.shape[0] for scan in scans])
+        for scan, result in zip(scans, combined):
+            scan.inference_path = "tta"
+            scan.tta = {
+                "variants": list(tta.variants_for(scan.enhancement not in ("off", "skipped"))),
+                "aggregation": tta.aggregation,
+                "agreement": result.agreement,
+            }
+        return [
+            [ClassifierResult(class_name=r.class_name, confidence=r.confidence, probabilities=tuple(r.probabilities))]
+            for r in combined
+        ]
+
+    rows = model.predict_batch(np.concatenate([scan.tensors for scan in scans], axis=0))
+    results: list[list[Any] | None] = []
+    offset = 0
+    for scan in scans:
+        count = scan.tensors.shape[0]
+        results.append(list(rows[offset:offset + count]))
+        offset += count
+        scan.inference_path = "parallel" if count > 1 else "original"
+
+    threshold = settings.cascade_fruit_threshold if subject == "fruit" else settings.cascade_leaf_threshold
+    retry = [
+        position
+        for position, scan in enumerate(scans)
+        if scan.image_bgr is not None and results[position][0].confidence < threshold
+    ]
+    if retry:
+        enhanced = np.stack(
+            [
+                enhanced_model_input(
+                    scans[position].image_bgr, settings.enhancement_preset, settings.enhancement_working_size
+                )
+                for position in retry
+            ]
+        ).astype(np.float32) / 255.0
+        for position, pred in zip(retry, model.predict_batch(enhanced)):
+            results[position].append(pred)
+            scans[position].inference_path = "cascade_second_pass"
+            scans[position].enhancement = settings.enhancement_preset
+
+    for scan in scans:
+        if scan.image_bgr is not None:
+            if scan.enhancement == "deferred":
+                scan.inference_path = "cascade_confident"
+                scan.enhancement = "skipped"
+            scan.image_bgr = None
+    return results
+
+
+def _select_prediction(subject: str, scan: _PreparedScan, preds: list[Any] | None) -> tuple[Any, bool]:
+    """Pick the more confident of the (original[, enhanced]) rows, or fall back to heuristics."""
+    if preds is not None:
+        pred_original = preds[0]
+        if len(preds) > 1 and preds[1].confidence > pred_original.confidence:
+            return preds[1], True
+        return pred_original, False
+    if subject == "fruit":
+        return fruit_fallback.predict_from_features(scan.analysis.features), False
+    return leaf_fallback.predict_from_features(scan.analysis.features), False
+
+
+def _probability_map(pred: Any, classes: list[str]) -> dict[str, float] | None:
+    """{class: probability} for model predictions; None for heuristic fallbacks."""
+    probabilities = getattr(pred, "probabilities", None)
+    if probabilities is None:
+        return None
+    return {name: round(float(p), 6) for name, p in zip(classes, probabilities)}
+
+
+def _build_prediction_response(
+    subject: str, scan: _PreparedScan, best_pred: Any, used_enhanced: bool
+) -> tuple[dict[str, Any], dict[str, Any] | None, dict[str, Any] | None]:
+    """Turn a model prediction into the /predict response; also returns the raw fruit/leaf objects."""
+    image_sha256 = scan.image_sha256
+    features = scan.analysis.features
+    image_quality = scan.analysis.quality
+    mold_heuristic = scan.analysis.mold_flag
+
+    fruit_pred = best_pred if subject == "fruit" else None
+    leaf_pred = best_pred if subject == "leaf" else None
 
     # Build extended response
     fruit_obj: dict[str, Any] | None = None
@@ -446,6 +793,7 @@ def predict():
         fruit_obj = {
             "class": fruit_class,
             "confidence": fruit_pred.confidence,
+            "probabilities": _probability_map(fruit_pred, FRUIT_CLASSES),
             "ripeness_stage": ripeness,
             "mold_present": (fruit_class == "mold") or mold_heuristic,
             "quality": quality,
@@ -456,6 +804,7 @@ def predict():
         leaf_obj = {
             "class": leaf_class,
             "confidence": leaf_pred.confidence,
+            "probabilities": _probability_map(leaf_pred, LEAF_CLASSES),
             "mold_present": (leaf_class == "mold") or mold_heuristic,
         }
 
@@ -509,6 +858,9 @@ def predict():
                 "leaf_model_available": leaf_model.available(),
                 "detection_reason": bignay_detection["reason"],
                 "used_enhanced_image": used_enhanced,
+                "enhancement": scan.enhancement,
+                "inference_path": scan.inference_path,
+                "tta": scan.tta,
             },
             "time": datetime.now(timezone.utc).isoformat(),
         }
@@ -560,47 +912,386 @@ def predict():
                 "fruit_model_available": fruit_model.available(),
                 "leaf_model_available": leaf_model.available(),
                 "used_enhanced_image": used_enhanced,
+                "enhancement": scan.enhancement,
+                "inference_path": scan.inference_path,
+                "tta": scan.tta,
             },
             "time": datetime.now(timezone.utc).isoformat(),
         }
 
+    return safe_json(response), fruit_obj, leaf_obj
+
+
+def _save_prediction(
+    response: dict[str, Any],
+    fruit_obj: dict[str, Any] | None,
+    leaf_obj: dict[str, Any] | None,
+    scan: _PreparedScan,
+    model_version: str,
+    client: dict[str, Any],
+    image: tuple[bytes, str] | None,
+) -> dict[str, Any]:
+    """Cache the response and persist its prediction record; returns the response's "db" block."""
+    record_fields = {
+        "image_dhash": scan.analysis.features.perceptual_hash,
+        # response is already JSON-safe; only the raw model objects still need converting
+        "fruit": safe_json(fruit_obj),
+        "leaf": safe_json(leaf_obj),
+    }
+    if prediction_cache is not None:
+        prediction_cache.put(
+            (scan.image_sha256, response["subject"], model_version),
+            {**{field: response[field] for field in CACHED_RESPONSE_FIELDS}, "record": record_fields},
+        )
+    return _store_prediction(response, record_fields, model_version, client, image)
+
+
+def _store_prediction(
+    response: dict[str, Any],
+    record_fields: dict[str, Any],
+    model_version: str,
+    client: dict[str, Any],
+    image: tuple[bytes, str] | None,
+) -> dict[str, Any]:
+    """Persist one scan (fresh or answered from the cache) and, if requested, its image."""
+    image_sha256 = response["image_sha256"]
+
     # Store to MongoDB (metadata by default)
     record = {
-        "subject": subject,
+        "subject": response["subject"],
         "image_sha256": image_sha256,
+        "image_dhash": record_fields["image_dhash"],
+        "model_version": model_version,
         "result": response["result"],
         "confidence": response["confidence"],
-        "fruit": fruit_obj,
-        "leaf": leaf_obj,
+        "is_bignay": response["is_bignay"],
+        "detection": response["detection"],
+        "fruit": record_fields["fruit"],
+        "leaf": record_fields["leaf"],
+        "image_quality": response["image_quality"],
         "color": response["color"],
         "size": response["size"],
         "recommendation": response["recommendation"],
         "debug": response["debug"],
-        "client": {
-            "ip": request.remote_addr,
-            "user_agent": request.headers.get("User-Agent"),
-        },
+        "client": client,
     }
-    if settings.store_images_in_db or bool(body.get("store_image")):
-        record["image_data_url"] = data_url
+    image_stored = False
+    if image is not None and blob_store is not None:
+        img_bytes, image_mimetype = image
+        try:
+            # Deduplicated by content: repeat uploads of the same photo are written once
+            record["image_blob"] = blob_store.put(img_bytes, image_sha256)
+            record["image_mimetype"] = image_mimetype
+            image_stored = True
+        except OSError as e:
+            print(f"✗ Failed to store scan image {image_sha256[:12]}: {e}")
 
     try:
-        inserted_id = store.insert_prediction(safe_json(record))
-        response["db"] = {"saved": bool(inserted_id), "id": inserted_id}
+        inserted_id = store.insert_prediction(record)
+        saved = {"saved": bool(inserted_id), "id": inserted_id}
+        if image is not None:
+            saved["image_stored"] = image_stored
+        if store.write_behind:
+            # Queued for the background writer; the id is already final
+            saved["deferred"] = True
+        return saved
     except Exception as e:  # pylint: disable=broad-except
-        response["db"] = {"saved": False, "error": str(e)}
+        return {"saved": False, "error": str(e)}
+
+
+def _request_client() -> dict[str, Any]:
+    return {
+        "ip": request.remote_addr,
+        "user_agent": request.headers.get("User-Agent"),
+    }
+
+
+@app.post("/predict")
+def predict():
+    try:
+        img_bytes, subject, store_image, image_mimetype = _read_predict_upload()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if subject not in {"fruit", "leaf"}:
+        return jsonify({"error": "Invalid 'subject'. Use 'fruit' or 'leaf'."}), 400
+
+    image_sha256 = sha256_bytes(img_bytes)
+
+    # Re-submitted photos skip decoding and inference, but are still recorded as scans
+    model_version = _model_version(subject)
+    image = (img_bytes, image_mimetype) if settings.store_images_in_db or store_image else None
+    cached = _cached_prediction(image_sha256, subject, model_version)
+    if cached is not None:
+        response, record_fields = cached
+        response["time"] = datetime.now(timezone.utc).isoformat()
+        response["db"] = {
+            **_store_prediction(response, record_fields, model_version, _request_client(), image),
+            "cached": True,
+        }
+        return jsonify(response)
+
+    try:
+        scan = _prepare_scan(img_bytes, image_sha256)
+    except ValueError as e:
+        # Undecodable upload (corrupt or not an image) is a client error, not a 500
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify(safe_json(response))
+    # Keep the more confident of the original and (if run) enhanced predictions
+    model = fruit_model if subject == "fruit" else leaf_model
+    preds = _run_inference(subject, model, [scan])[0]
+    best_pred, used_enhanced = _select_prediction(subject, scan, preds)
+
+    response, fruit_obj, leaf_obj = _build_prediction_response(subject, scan, best_pred, used_enhanced)
+    response["db"] = _save_prediction(
+        response, fruit_obj, leaf_obj, scan, model_version, _request_client(), image
+    )
+    return jsonify(response)
+
+
+# Decode/preprocess pool for /predict/batch; model calls stay on the request thread
+_scan_pool = ThreadPoolExecutor(max_workers=settings.batch_predict_workers, thread_name_prefix="scan")
+
+
+def _read_batch_upload() -> list[dict[str, Any]]:
+    """
+    Pull the images out of a /predict/batch request.
+
+    - multipart/form-data: any number of "image" file parts; "subject"/"store_image" form
+      fields apply to all of them
+    - application/x-ndjson: one JSON object per line, each shaped like a /predict JSON body
+    """
+    mimetype = request.mimetype or ""
+    items: list[dict[str, Any]] = []
+
+    if mimetype == "multipart/form-data":
+        subject = str(request.form.get("subject", "fruit")).strip().lower()
+        store_image = _truthy(request.form.get("store_image", False))
+        for upload in request.files.getlist("image"):
+            items.append({
+                "bytes": upload.read(),
+                "subject": subject,
+                "store_image": store_image,
+                "mimetype": upload.mimetype or "image/jpeg",
+            })
+    elif mimetype in {"application/x-ndjson", "application/jsonl", "application/json-seq"}:
+        for line_no, line in enumerate(request.get_data(cache=False).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                body = json.loads(line)
+                data_url = body["image"]
+                img_bytes = decode_data_url(data_url)
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"Line {line_no}: invalid item ({e})") from e
+            header = data_url[:data_url.find(",")]
+            items.append({
+                "bytes": img_bytes,
+                "subject": str(body.get("subject", "fruit")).strip().lower(),
+                "store_image": _truthy(body.get("store_image", False)),
+                "mimetype": (header[5:].split(";", 1)[0] if header.startswith("data:") else "") or "image/jpeg",
+            })
+    else:
+        raise ValueError("Use multipart/form-data with 'image' parts or application/x-ndjson")
+
+    if not items:
+        raise ValueError("No images in request")
+    if len(items) > settings.batch_predict_max_images:
+        raise ValueError(f"Too many images (max {settings.batch_predict_max_images})")
+    for index, item in enumerate(items):
+        if item["subject"] not in {"fruit", "leaf"}:
+            raise ValueError(f"Item {index}: invalid 'subject'. Use 'fruit' or 'leaf'.")
+        if not item["bytes"]:
+            raise ValueError(f"Item {index}: empty image")
+    return items
+
+
+def _batch_summary(responses: list[dict[str, Any]]) -> dict[str, Any]:
+    """Aggregate ripeness/mold over the Bignay images of a batch and recommend for the lot."""
+    bignay = [r for r in responses if r.get("is_bignay")]
+    fruits = [r["fruit"] for r in bignay if r.get("fruit")]
+    ripeness_counts = Counter(f["ripeness_stage"] for f in fruits if f.get("ripeness_stage"))
+    quality_counts = Counter(f["quality"] for f in fruits if f.get("quality"))
+    mold_count = sum(1 for r in bignay if (r.get("fruit") or r.get("leaf") or {}).get("mold_present"))
+
+    ripeness_stage = ripeness_counts.most_common(1)[0][0] if ripeness_counts else None
+    quality = quality_counts.most_common(1)[0][0] if quality_counts else None
+    rec = recommend(ripeness_stage=ripeness_stage, mold_present=mold_count > 0, quality=quality)
+
+    return {
+        "images": len(responses),
+        "bignay_images": len(bignay),
+        "not_bignay_images": len(responses) - len(bignay),
+        "results": dict(Counter(r["result"] for r in responses)),
+        "ripeness": dict(ripeness_counts),
+        "mold_count": mold_count,
+        "dominant_ripeness_stage": ripeness_stage,
+        "recommendation": {
+            "primary": rec.primary,
+            "alternatives": rec.alternatives,
+            "reason": rec.reason,
+        },
+    }
+
+
+@app.post("/predict/batch")
+def predict_batch():
+    """
+    Scan many images in one request. Images are decoded and preprocessed in parallel,
+    inferred in model batches of up to BATCH_PREDICT_CHUNK images, and streamed back as
+    NDJSON lines ({"index": i, ...same fields as /predict}) as soon as each chunk is done,
+    followed by a final {"summary": ...} line. An image that fails at any stage gets an
+    {"index": i, "error": ...} line instead; the rest of the batch and the summary still follow.
+    """
+    try:
+        items = _read_batch_upload()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    client = _request_client()
+    chunk_size = max(1, settings.batch_predict_chunk)
+
+    def scan_item(
+        index: int,
+    ) -> tuple[int, tuple[dict[str, Any], dict[str, Any]] | None, _PreparedScan | None, str]:
+        item = items[index]
+        image_sha256 = sha256_bytes(item["bytes"])
+        model_version = _model_version(item["subject"])
+        cached = _cached_prediction(image_sha256, item["subject"], model_version)
+        if cached is not None:
+            return index, cached, None, model_version
+        return index, None, _prepare_scan(item["bytes"], image_sha256), model_version
+
+    def item_image(index: int) -> tuple[bytes, str] | None:
+        item = items[index]
+        return (item["bytes"], item["mimetype"]) if settings.store_images_in_db or item["store_image"] else None
+
+    def finish(index: int, response: dict[str, Any]) -> str:
+        response["time"] = datetime.now(timezone.utc).isoformat()
+        return json.dumps({"index": index, **response}) + "\n"
+
+    def failed(index: int, message: str) -> str:
+        return json.dumps({"index": index, "error": message}) + "\n"
+
+    def generate():
+        responses: list[dict[str, Any]] = []
+        pending: dict[str, list[tuple[int, _PreparedScan, str]]] = {"fruit": [], "leaf": []}
+
+        def flush(subject: str):
+            chunk, pending[subject] = pending[subject], []
+            if not chunk:
+                return
+            model = fruit_model if subject == "fruit" else leaf_model
+            try:
+                # Every scan in the chunk shares one forward pass (plus one cascade second pass)
+                all_preds = _run_inference(subject, model, [scan for _, scan, _ in chunk])
+            except Exception as e:  # pylint: disable=broad-except
+                # Fail this chunk's items and keep streaming the rest of the batch
+                for index, _, _ in chunk:
+                    yield failed(index, f"Inference failed: {e}")
+                return
+            for (index, scan, model_version), preds in zip(chunk, all_preds):
+                try:
+                    best_pred, used_enhanced = _select_prediction(subject, scan, preds)
+                    response, fruit_obj, leaf_obj = _build_prediction_response(subject, scan, best_pred, used_enhanced)
+                    response["db"] = _save_prediction(
+                        response, fruit_obj, leaf_obj, scan, model_version, client, item_image(index)
+                    )
+                except Exception as e:  # pylint: disable=broad-except
+                    yield failed(index, f"Could not process image: {e}")
+                    continue
+                responses.append(response)
+                yield finish(index, response)
+
+        futures = [_scan_pool.submit(scan_item, index) for index in range(len(items))]
+        for future in as_completed(futures):
+            try:
+                index, cached, scan, model_version = future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                yield failed(futures.index(future), f"Could not process image: {e}")
+                continue
+
+            if cached is not None:
+                response, record_fields = cached
+                try:
+                    stored = _store_prediction(response, record_fields, model_version, client, item_image(index))
+                except Exception as e:  # pylint: disable=broad-except
+                    yield failed(index, f"Could not process image: {e}")
+                    continue
+                response["db"] = {**stored, "cached": True}
+                responses.append(response)
+                yield finish(index, response)
+                continue
+
+            subject = items[index]["subject"]
+            pending[subject].append((index, scan, model_version))
+            if len(pending[subject]) >= chunk_size:
+                yield from flush(subject)
+
+        for subject in ("fruit", "leaf"):
+            yield from flush(subject)
+
+        yield json.dumps({"summary": safe_json(_batch_summary(responses))}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def _parse_date_arg(name: str) -> datetime | None:
+    value = request.args.get(name)
+    if not value:
+        return None
+    # Accept ISO 8601 dates/datetimes; a trailing "Z" and naive values are treated as UTC
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed.replace(tzinfo=timezone.utc) if parsed.tzinfo is None else parsed
 
 
 @app.get("/predictions")
 def predictions():
+    """Newest-first prediction history.
+
+    Query params: limit (max 200), cursor (next_cursor from the previous page),
+    subject, result, since/until (ISO 8601), include_images.
+    """
     try:
         limit = int(request.args.get("limit", "50"))
     except ValueError:
         limit = 50
-    items = store.list_predictions(limit=limit)
-    return jsonify({"items": items, "count": len(items)})
+    try:
+        since = _parse_date_arg("since")
+        until = _parse_date_arg("until")
+    except ValueError:
+        return jsonify({"error": "since/until must be ISO 8601 dates"}), 400
+
+    try:
+        page = store.list_predictions(
+            limit=limit,
+            cursor=request.args.get("cursor") or None,
+            subject=request.args.get("subject") or None,
+            result=request.args.get("result") or None,
+            since=since,
+            until=until,
+            include_images=_truthy(request.args.get("include_images")),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    for item in page.items:
+        if item.get("image_blob"):
+            item["image_url"] = f"/predictions/images/{item['image_blob']}"
+    return jsonify({"items": page.items, "count": len(page.items), "next_cursor": page.next_cursor})
+
+
+@app.get("/predictions/images/<image_sha256>")
+def prediction_image(image_sha256: str):
+    """Raw bytes of a stored scan image, addressed by the record's image_blob hash."""
+    data = blob_store.get(image_sha256) if blob_store is not None else None
+    if data is None:
+        return jsonify({"error": "Image not found"}), 404
+    response = Response(data, mimetype=sniff_mimetype(data))
+    # Content-addressed, so the bytes behind a hash never change
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    response.set_etag(image_sha256.lower())
+    return response.make_conditional(request)
+
 
 if __name__ == "__main__":
     import socket
@@ -0,0 +1,513 @@
+"""
+Bignay Backend Micro-benchmarks
+===============================
+Small, self-contained timing harnesses for the hot paths behind /predict.
+
+Usage:
+    python benchmark.py inference --subject fruit
+    python benchmark.py inference --subject leaf --repeats 50
+    python benchmark.py analysis --megapixels 12
+    python benchmark.py hashing --megapixels 12
+    python benchmark.py masks --megapixels 2
+    python benchmark.py enhancement --subject fruit --data-dir ../dataset/fruit
+    python benchmark.py reviews --products 5000 --latency-ms 1
+
+The reviews benchmark runs against mongomock (pip install mongomock), an
+in-process MongoDB stand-in; --latency-ms adds a simulated network round-trip.
+
+Each benchmark prints a plain-text table; nothing is written to disk.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Callable
+
+import numpy as np
+
+
+def _time_call(
+    fn: Callable[[], object], repeats: int, warmup: int = 3, clock: Callable[[], float] = time.perf_counter
+) -> tuple[float, float]:
+    """Return (median_ms, p90_ms) for ``fn`` over ``repeats`` runs after ``warmup`` runs."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = clock()
+        fn()
+        samples.append((clock() - start) * 1000.0)
+    samples.sort()
+    p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+    return statistics.median(samples), p90
+
+
+def bench_inference(subject: str, repeats: int) -> None:
+    """Compare Model.predict() against the traced direct-call path."""
+    from app import fruit_model, leaf_model
+    from inference import KerasClassifier
+
+    classifier = fruit_model if subject == "fruit" else leaf_model
+    # Unwrap MicroBatcher if batching is enabled
+    classifier = getattr(classifier, "_classifier", classifier)
+    if not isinstance(classifier, KerasClassifier):
+        print("Inference backend is not keras - set INFERENCE_BACKEND=keras to benchmark predict()")
+        return
+    if not classifier.available():
+        print(f"No {subject} model available - nothing to benchmark")
+        return
+
+    classifier._load()
+    model = classifier._model
+    if classifier._infer is None:
+        print("Traced path unavailable (tracing failed) - only predict() is in use")
+        return
+
+    print(f"\n{subject} model: predict() vs traced call ({repeats} runs each)")
+    print(f"{'batch':>6} {'predict med':>12} {'predict p90':>12} {'traced med':>11} {'traced p90':>11} {'speedup':>8}")
+    for batch_size in (1, 2, 8, 32):
+        x = np.random.default_rng(batch_size).random((batch_size, 224, 224, 3), dtype=np.float32)
+        p_med, p_p90 = _time_call(lambda: model.predict(x, verbose=0), repeats)
+        t_med, t_p90 = _time_call(lambda: classifier._infer(x).numpy(), repeats)
+        print(f"{batch_size:>6} {p_med:>10.2f}ms {p_p90:>10.2f}ms {t_med:>9.2f}ms {t_p90:>9.2f}ms {p_med / t_med:>7.2f}x")
+
+
+def _synthetic_photo(megapixels: float, seed: int = 0) -> np.ndarray:
+    """A phone-photo-sized BGR frame: noisy background with a dark purple fruit-like blob."""
+    import cv2
+
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = int(round(width * 3 / 4))
+    rng = np.random.default_rng(seed)
+    image = rng.normal(170, 25, size=(height, width, 3)).clip(0, 255).astype(np.uint8)
+    cv2.ellipse(
+        image, (width // 2, height // 2), (width // 6, height // 5), 0, 0, 360, (70, 30, 110), thickness=-1
+    )
+    return cv2.GaussianBlur(image, (5, 5), 0)
+
+
+def _legacy_contour_mask(image_bgr: np.ndarray) -> tuple[np.ndarray, float]:
+    """Frozen copy of _largest_contour_mask before user-008 (converts to HSV itself)."""
+    import cv2
+
+    h, w = image_bgr.shape[:2]
+    hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
+    gray = cv2.addWeighted(hsv[:, :, 1], 0.6, hsv[:, :, 2], 0.4, 0)
+    gray = cv2.GaussianBlur(gray, (7, 7), 0)
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel = np.ones((7, 7), np.uint8)
+    thresh = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=2)
+    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=1)
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return np.zeros((h, w), dtype=np.uint8), 0.0
+    contour = max(contours, key=cv2.contourArea)
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.drawContours(mask, [contour], -1, 255, thickness=-1)
+    return mask, float(cv2.contourArea(contour)) / float(h * w)
+
+
+def _legacy_analysis(img_bytes: bytes) -> None:
+    """
+    Frozen copy of the /predict analysis before user-008: full-size decode, then
+    extract_features (own HSV + LAB, boolean-index means, JPEG re-encode for the hash),
+    assess_image_quality (own GRAY) and the app-local mold heuristic (own HSV).
+    The quality issue/recommendation bookkeeping is omitted; it is scalar logic.
+    """
+    import cv2
+
+    from utils_image import decode_image_bytes, sha256_bytes
+
+    image = decode_image_bytes(img_bytes)
+
+    mask, coverage = _legacy_contour_mask(image)
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+    if coverage > 0.01:
+        mask_bool = mask.astype(bool)
+        hsv_pixels, lab_pixels = hsv[mask_bool], lab[mask_bool]
+        np.sqrt(4.0 * float(mask.sum() / 255.0) / np.pi)
+    else:
+        hsv_pixels, lab_pixels = hsv.reshape(-1, 3), lab.reshape(-1, 3)
+    hsv_pixels.mean(axis=0)
+    lab_pixels.mean(axis=0)
+    ok, encoded = cv2.imencode(".jpg", image)
+    sha256_bytes(encoded.tobytes() if ok else image.tobytes())
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    cv2.Laplacian(gray, cv2.CV_64F).var()
+    np.mean(gray)
+    np.std(gray)
+
+    _legacy_mold_ratio(cv2.cvtColor(image, cv2.COLOR_BGR2HSV))  # compared against 0.22
+
+
+def bench_analysis(megapixels: float, repeats: int) -> None:
+    """Pre-user-008 separate passes vs fused analyze_image(), both from the uploaded JPEG bytes."""
+    import cv2
+
+    from config import get_settings
+    from utils_image import analyze_image, decode_image_bytes, decode_image_for_analysis, sha256_bytes
+
+    image = _synthetic_photo(megapixels)
+    h, w = image.shape[:2]
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    img_bytes = encoded.tobytes()
+    image_sha256 = sha256_bytes(img_bytes)
+    max_side = get_settings().analysis_max_side
+
+    def fused():
+        analyze_image(decode_image_bytes(img_bytes), image_sha256)
+
+    def current():
+        # What /predict does today: reduced decode, then the fused pass
+        frame, pixel_scale = decode_image_for_analysis(img_bytes, max_side)
+        analyze_image(frame, image_sha256, pixel_scale=pixel_scale, perceptual_hash="dhash")
+
+    print(f"\nImage analysis of a {w}x{h} ({w * h / 1e6:.1f} MP) JPEG upload ({repeats} runs each)")
+    print(f"{'path':>22} {'wall med':>10} {'wall p90':>10} {'cpu med':>10} {'cpu p90':>10}")
+    for name, fn in (
+        ("before (separate)", lambda: _legacy_analysis(img_bytes)),
+        ("fused, full decode", fused),
+        (f"fused, max side {max_side}", current),
+    ):
+        w_med, w_p90 = _time_call(fn, repeats, warmup=1)
+        c_med, c_p90 = _time_call(fn, repeats, warmup=1, clock=time.process_time)
+        print(f"{name:>22} {w_med:>8.1f}ms {w_p90:>8.1f}ms {c_med:>8.1f}ms {c_p90:>8.1f}ms")
+
+
+def bench_hashing(megapixels: float, repeats: int) -> None:
+    """Cost of the old JPEG re-encode hash vs perceptual hashes, plus near-duplicate distances."""
+    import cv2
+
+    from utils_image import dhash, extract_features, hamming_distance, phash, sha256_bytes
+
+    image = _synthetic_photo(megapixels)
+    h, w = image.shape[:2]
+
+    def reencode_sha256():
+        # What extract_features used to do on every call
+        ok, encoded = cv2.imencode(".jpg", image)
+        sha256_bytes(encoded.tobytes())
+
+    print(f"\nHashing on a {w}x{h} ({w * h / 1e6:.1f} MP) frame ({repeats} runs each)")
+    print(f"{'step':>28} {'median':>10} {'p90':>10}")
+    for name, fn in (
+        ("jpeg re-encode + sha256", reencode_sha256),
+        ("dhash", lambda: dhash(image)),
+        ("phash", lambda: phash(image)),
+        ("extract_features (no hash)", lambda: extract_features(image)),
+        ("extract_features + dhash", lambda: extract_features(image, perceptual_hash="dhash")),
+    ):
+        med, p90 = _time_call(fn, repeats, warmup=1)
+        print(f"{name:>28} {med:>8.1f}ms {p90:>8.1f}ms")
+
+    # Near-duplicate sanity check: recompressed/resized copy vs an unrelated frame
+    _, recompressed = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 60])
+    near = cv2.resize(cv2.imdecode(recompressed, cv2.IMREAD_COLOR), (w // 3, h // 3), interpolation=cv2.INTER_AREA)
+    other = cv2.flip(_synthetic_photo(megapixels, seed=1), 1)
+    other = cv2.rectangle(other, (0, 0), (w // 3, h // 2), (20, 160, 40), thickness=-1)
+    print("\nHamming distance (64-bit hashes)  near-duplicate  different")
+    for name, fn in (("dhash", dhash), ("phash", phash)):
+        base = fn(image)
+        print(f"{name:>32} {hamming_distance(base, fn(near)):>14d} {hamming_distance(base, fn(other)):>10d}")
+
+
+def _legacy_mold_ratio(hsv: np.ndarray) -> float:
+    """Frozen copy of the mold heuristic before user-016 (app.py _mold_flag_from_image, minus the 0.22 cut)."""
+    s = hsv[:, :, 1]
+    v = hsv[:, :, 2]
+    moldish = (v < 55) & (s < 85)
+    return float(np.mean(moldish))
+
+
+def _legacy_color_and_size(
+    hsv: np.ndarray, lab: np.ndarray, mask: np.ndarray, coverage: float
+) -> tuple[list[float], list[float], float | None]:
+    """Frozen copy of extract_features' boolean-index colour means and size before user-016."""
+    if coverage > 0.01:
+        mask_bool = mask.astype(bool)
+        hsv_pixels = hsv[mask_bool]
+        lab_pixels = lab[mask_bool]
+    else:
+        hsv_pixels = hsv.reshape(-1, 3)
+        lab_pixels = lab.reshape(-1, 3)
+
+    hsv_mean = hsv_pixels.mean(axis=0).astype(float).tolist()
+    lab_mean = lab_pixels.mean(axis=0).astype(float).tolist()
+
+    size_px_diameter = None
+    if coverage > 0.01:
+        area = float(mask.sum() / 255.0)
+        size_px_diameter = float(np.sqrt(4.0 * area / np.pi))
+    return hsv_mean, lab_mean, size_px_diameter
+
+
+def _mask_fixtures(megapixels: float) -> list[tuple[str, np.ndarray]]:
+    import cv2
+
+    fixtures = [(f"photo seed {seed}", _synthetic_photo(megapixels, seed)) for seed in range(3)]
+
+    moldy = _synthetic_photo(megapixels, seed=3)
+    h, w = moldy.shape[:2]
+    cv2.circle(moldy, (w // 2, h // 2), min(h, w) // 12, (45, 48, 50), thickness=-1)
+    fixtures.append(("moldy patch", moldy))
+
+    # Frame-filling subject, and a black frame with no contour (whole-frame fallback)
+    fixtures.append(("flat frame", np.full((h, w, 3), 128, dtype=np.uint8)))
+    fixtures.append(("black frame", np.zeros((h, w, 3), dtype=np.uint8)))
+    return fixtures
+
+
+def bench_masks(megapixels: float, repeats: int) -> None:
+    """
+    Masked cv2 reductions vs the frozen boolean-index statistics. Equivalence is asserted
+    by tests/test_mask_stats.py; this prints the largest differences and the timings.
+    """
+    import cv2
+
+    from utils_image import _color_and_size, _largest_contour_mask, _mold_ratio
+
+    print(f"\nMask statistics vs the pre-change implementation on {megapixels:.1f} MP fixtures")
+    for name, image in _mask_fixtures(megapixels):
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+        mask, coverage = _largest_contour_mask(image, hsv)
+
+        hsv_mean, lab_mean, size = _color_and_size(hsv, lab, mask, coverage)
+        ref_hsv, ref_lab, ref_size = _legacy_color_and_size(hsv, lab, mask, coverage)
+        colour_diff = float(np.max(np.abs(np.subtract(hsv_mean + lab_mean, ref_hsv + ref_lab))))
+        size_diff = 0.0 if size is None and ref_size is None else abs(size - ref_size)
+        mold_diff = abs(_mold_ratio(hsv) - _legacy_mold_ratio(hsv))
+        print(
+            f"  {name:<14} coverage={coverage:.3f} max colour diff={colour_diff:.2e} "
+            f"size diff={size_diff:.2e} mold diff={mold_diff:.2e}"
+        )
+
+    image = _mask_fixtures(megapixels)[0][1]
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+    mask, coverage = _largest_contour_mask(image, hsv)
+    print(f"\n{'path':>12} {'median':>10} {'p90':>10}  ({repeats} runs each)")
+    for name, fn in (
+        ("bool-index", lambda: (_legacy_color_and_size(hsv, lab, mask, coverage), _legacy_mold_ratio(hsv))),
+        ("masked cv2", lambda: (_color_and_size(hsv, lab, mask, coverage), _mold_ratio(hsv))),
+    ):
+        med, p90 = _time_call(fn, repeats, warmup=1)
+        print(f"{name:>12} {med:>8.2f}ms {p90:>8.2f}ms")
+
+
+ENHANCEMENT_CONFIGS = (
+    ("off", "always", 224),
+    ("fast", "auto", 224),
+    ("fast", "always", 224),
+    ("full", "auto", 224),
+    ("full", "always", 224),
+    ("full", "always", 0),  # previous behaviour: full preset on the analysis-size frame
+)
+
+
+def _dataset_images(data_dir, classes: list[str], limit: int) -> list[tuple[str, bytes]]:
+    """Up to ``limit`` (label, encoded bytes) pairs per class from ``data_dir/<class>/``."""
+    samples = []
+    for cls in classes:
+        cls_dir = data_dir / cls
+        if not cls_dir.is_dir():
+            continue
+        files = sorted(p for p in cls_dir.iterdir() if p.suffix.lower() in {".jpg", ".jpeg", ".png", ".webp"})
+        samples.extend((cls, path.read_bytes()) for path in files[:limit])
+    return samples
+
+
+def bench_enhancement(subject: str, data_dir, limit: int, megapixels: float) -> None:
+    """Per-preset enhancement cost and, with a dataset and trained model, top-1 accuracy."""
+    from pathlib import Path
+
+    import cv2
+
+    from app import fruit_model, leaf_model, settings
+    from config import BACKEND_DIR
+    from inference import FRUIT_CLASSES, LEAF_CLASSES
+    from utils_image import analyze_image, decode_image_for_analysis, prepare_model_inputs
+
+    classes = FRUIT_CLASSES if subject == "fruit" else LEAF_CLASSES
+    model = fruit_model if subject == "fruit" else leaf_model
+    data_dir = Path(data_dir) if data_dir else BACKEND_DIR.parent / "dataset" / subject
+
+    samples = _dataset_images(data_dir, classes, limit)
+    if samples:
+        print(f"\n{subject}: {len(samples)} images from {data_dir}")
+    else:
+        print(f"\nNo images under {data_dir} - timing only, on synthetic {megapixels:.0f} MP frames")
+        samples = [("", cv2.imencode(".jpg", _synthetic_photo(megapixels, seed))[1].tobytes()) for seed in range(8)]
+    score = bool(samples[0][0]) and model.available()
+    if samples[0][0] and not score:
+        print(f"No {subject} model available - reporting timing only")
+
+    scans = []
+    for label, data in samples:
+        image, _ = decode_image_for_analysis(data, settings.analysis_max_side)
+        scans.append((label, image, analyze_image(image, "0" * 64).quality))
+
+    print(f"{'preset':>6} {'mode':>7} {'work':>5} {'prep med':>9} {'prep p90':>9} {'enhanced':>9} {'accuracy':>9}")
+    for preset, mode, working_size in ENHANCEMENT_CONFIGS:
+        samples_ms, enhanced, correct = [], 0, 0
+        for label, image, quality in scans:
+            start = time.perf_counter()
+            tensors, applied = prepare_model_inputs(image, quality, preset, mode, working_size)
+            samples_ms.append((time.perf_counter() - start) * 1000.0)
+            enhanced += applied in ("fast", "full")
+            if score:
+                best = max(model.predict_batch(tensors), key=lambda r: r.confidence)
+                correct += best.class_name == label
+        samples_ms.sort()
+        p90 = samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.9))]
+        accuracy = f"{correct / len(scans):>8.1%}" if score else f"{'-':>8}"
+        work = working_size or "frame"
+        print(
+            f"{preset:>6} {mode:>7} {work:>5} {statistics.median(samples_ms):>7.2f}ms {p90:>7.2f}ms "
+            f"{enhanced / len(scans):>8.0%} {accuracy}"
+        )
+
+
+class _RoundTripCounter:
+    """Collection proxy that counts server calls and sleeps ``latency`` seconds per call."""
+
+    def __init__(self, collection, latency: float):
+        self._collection = collection
+        self._latency = latency
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in ("find_one", "aggregate"):
+            return attr
+
+        def call(*args, **kwargs):
+            self.calls += 1
+            if self._latency:
+                time.sleep(self._latency)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+def _seed_products(db, products: int, reviews_per_product: int, seed: int = 0) -> list[str]:
+    from datetime import datetime, timedelta, timezone
+
+    rng = np.random.default_rng(seed)
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    ids = [str(i) for i in db.products.insert_many(
+        [{"name": f"Product {i}", "is_active": True, "created_at": base + timedelta(minutes=i)} for i in range(products)]
+    ).inserted_ids]
+    reviews = []
+    for product_id in ids:
+        # Some products have no reviews; some reviews are inactive
+        for r in range(int(rng.integers(0, reviews_per_product * 2 + 1))):
+            reviews.append({
+                "product_id": product_id,
+                "is_active": bool(rng.random() > 0.2),
+                "rating": int(rng.integers(1, 6)),
+                "comment": f"review {r}",
+                "user_name": f"user{int(rng.integers(0, 1000))}",
+                "created_at": base + timedelta(minutes=int(rng.integers(0, 10 ** 6))),
+            })
+    if reviews:
+        db.reviews.insert_many(reviews)
+    db.reviews.create_index([("product_id", 1), ("is_active", 1), ("created_at", -1)])
+    return ids
+
+
+def bench_reviews(products: int, reviews_per_product: int, page_size: int, latency_ms: float, repeats: int) -> None:
+    """Per-product find_one() vs the single $group aggregation behind /api/products."""
+    try:
+        import mongomock
+    except ImportError:
+        print("mongomock is not installed - pip install mongomock to run this benchmark")
+        return
+
+    from routes.products import _latest_review_dict, _latest_reviews_by_product
+
+    db = mongomock.MongoClient().bignay_bench
+    ids = _seed_products(db, products, reviews_per_product)
+    reviews = _RoundTripCounter(db.reviews, latency_ms / 1000.0)
+    page = ids[:page_size]
+
+    def per_product():
+        latest = {}
+        for product_id in page:
+            review = reviews.find_one({"product_id": product_id, "is_active": True}, sort=[("created_at", -1)])
+            if review:
+                latest[product_id] = _latest_review_dict(review)
+        return latest
+
+    def aggregated():
+        return {pid: _latest_review_dict(r) for pid, r in _latest_reviews_by_product(reviews, page).items()}
+
+    assert per_product() == aggregated(), "aggregation returned different latest reviews"
+    print(
+        f"\nLatest review for a {len(page)}-product page ({products} products, "
+        f"{db.reviews.count_documents({})} reviews, {latency_ms:g} ms simulated latency, {repeats} runs each)"
+    )
+    print(f"{'path':>12} {'round-trips':>12} {'median':>10} {'p90':>10}")
+    for name, fn in (("find_one x N", per_product), ("aggregate", aggregated)):
+        reviews.calls = 0
+        fn()
+        trips = reviews.calls
+        med, p90 = _time_call(fn, repeats, warmup=1)
+        print(f"{name:>12} {trips:>12d} {med:>8.1f}ms {p90:>8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bignay backend micro-benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p_inf = sub.add_parser("inference", help="Model.predict() vs traced direct call")
+    p_inf.add_argument("--subject", choices=["fruit", "leaf"], default="fruit")
+    p_inf.add_argument("--repeats", type=int, default=30)
+
+    p_img = sub.add_parser("analysis", help="Pre-change separate passes vs fused image analysis")
+    p_img.add_argument("--megapixels", type=float, default=12.0)
+    p_img.add_argument("--repeats", type=int, default=10)
+
+    p_hash = sub.add_parser("hashing", help="JPEG re-encode hash vs perceptual hashes")
+    p_hash.add_argument("--megapixels", type=float, default=12.0)
+    p_hash.add_argument("--repeats", type=int, default=10)
+
+    p_mask = sub.add_parser("masks", help="Masked cv2 statistics vs the boolean-index version")
+    p_mask.add_argument("--megapixels", type=float, default=2.0)
+    p_mask.add_argument("--repeats", type=int, default=20)
+
+    p_enh = sub.add_parser("enhancement", help="Enhancement presets: cost and dataset accuracy")
+    p_enh.add_argument("--subject", choices=["fruit", "leaf"], default="fruit")
+    p_enh.add_argument("--data-dir", default=None, help="Defaults to ../dataset/<subject>")
+    p_enh.add_argument("--limit", type=int, default=50, help="Images per class")
+    p_enh.add_argument("--megapixels", type=float, default=12.0, help="Synthetic frame size without a dataset")
+
+    p_rev = sub.add_parser("reviews", help="N+1 latest-review lookups vs one aggregation (mongomock)")
+    p_rev.add_argument("--products", type=int, default=5000)
+    p_rev.add_argument("--reviews-per-product", type=int, default=3)
+    p_rev.add_argument("--page-size", type=int, default=50)
+    p_rev.add_argument("--latency-ms", type=float, default=1.0)
+    p_rev.add_argument("--repeats", type=int, default=10)
+
+    args = parser.parse_args()
+
+    if args.bench == "inference":
+        bench_inference(args.subject, args.repeats)
+    elif args.bench == "analysis":
+        bench_analysis(args.megapixels, args.repeats)
+    elif args.bench == "hashing":
+        bench_hashing(args.megapixels, args.repeats)
+    elif args.bench == "masks":
+        bench_masks(args.megapixels, args.repeats)
+    elif args.bench == "enhancement":
+        bench_enhancement(args.subject, args.data_dir, args.limit, args.megapixels)
+    elif args.bench == "reviews":
+        bench_reviews(args.products, args.reviews_per_product, args.page_size, args.latency_ms, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+
+def sniff_mimetype(data: bytes) -> str:
+    """Best-effort image MIME type from the file signature."""
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "application/octet-stream"
+
+
+class BlobStore(ABC):
+    """Content-addressed storage for scan images, keyed by the SHA-256 of the raw bytes.
+
+    Implementations must be idempotent: putting the same content twice stores it once.
+    """
+
+    name = "none"
+
+    @abstractmethod
+    def put(self, data: bytes, sha256: str | None = None) -> str:
+        """Store ``data`` and return its SHA-256 hex digest."""
+
+    @abstractmethod
+    def get(self, sha256: str) -> bytes | None:
+        """Stored bytes for ``sha256``, or None if absent or the id is invalid."""
+
+    @abstractmethod
+    def exists(self, sha256: str) -> bool:
+        """Whether a blob with this id is stored."""
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": self.name}
+
+
+def _is_sha256(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs on the local filesystem, sharded as ``<root>/ab/cd/<sha256>``.
+
+    Two levels of 256 directories keep each directory small even with millions of
+    scans. Writes go to a temporary file in the target directory and are renamed
+    into place, so readers never see a partial blob and concurrent writers of the
+    same content are harmless.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Path):
+        self._root = Path(root)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._dedup_hits = 0
+        self._bytes_written = 0
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    def path_for(self, sha256: str) -> Path:
+        sha256 = sha256.lower()
+        if not _is_sha256(sha256):
+            raise ValueError(f"Invalid blob id: {sha256!r}")
+        return self._root / sha256[:2] / sha256[2:4] / sha256
+
+    def exists(self, sha256: str) -> bool:
+        try:
+            return self.path_for(sha256).is_file()
+        except ValueError:
+            return False
+
+    def put(self, data: bytes, sha256: str | None = None) -> str:
+        sha256 = (sha256 or hashlib.sha256(data).hexdigest()).lower()
+        path = self.path_for(sha256)
+        if path.is_file():
+            with self._lock:
+                self._dedup_hits += 1
+            return sha256
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+        with self._lock:
+            self._writes += 1
+            self._bytes_written += len(data)
+        return sha256
+
+    def get(self, sha256: str) -> bytes | None:
+        try:
+            return self.path_for(sha256).read_bytes()
+        except (ValueError, FileNotFoundError):
+            return None
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "root": str(self._root),
+                "writes": self._writes,
+                "dedup_hits": self._dedup_hits,
+                "bytes_written": self._bytes_written,
+            }
+
+
+def build_blob_store(settings) -> BlobStore | None:
+    """Blob store selected by BLOB_STORE; None disables image storage."""
+    backend = settings.blob_store.strip().lower()
+    if backend in ("", "none", "off"):
+        return None
+    if backend == "local":
+        return LocalBlobStore(settings.blob_store_dir)
+    raise ValueError(f"Unknown BLOB_STORE backend: {settings.blob_store!r}")
@@ -47,8 +47,56 @@ class Settings:
     fruit_model_path: Path
     leaf_model_path: Path
 
-    # If true, API will store base64 images in MongoDB (not recommended)
+    # "keras" (full TensorFlow) or "tflite" (exported <model>_<variant>.tflite)
+    inference_backend: str
+    tflite_variant: str
+
+    # Load and warm up models in the background at startup; /health/ready gates on it
+    model_warmup: bool
+
+    # Shared model server (model_server.py); when set, web workers hold no models
+    model_server_address: str | None
+    # Required with MODEL_SERVER_ADDRESS: the server unpickles whatever authenticated clients send
+    model_server_authkey: str | None
+    model_server_concurrency: int
+
+    # Apply <model>_calibration.json temperature scaling (fitted by train_model.py) when present
+    model_calibration: bool
+
+    # Long-edge size uploads are decoded/downscaled to before analysis (0 = full resolution)
+    analysis_max_side: int
+
+    # Second-pass enhancement: preset (off/fast/full), mode (always/auto = only on blur or low
+    # contrast) and the long-edge size it runs at (224 = the resized model input, 0 = full frame)
+    enhancement_preset: str
+    enhancement_mode: str
+    enhancement_working_size: int
+    # Cascade: score the original first and only enhance + re-run below the subject's
+    # top-1 confidence threshold (per subject: chance is 1/5 for fruit but 1/2 for leaf)
+    inference_cascade: bool
+    cascade_fruit_threshold: float
+    cascade_leaf_threshold: float
+    # Test-time augmentation: extra views scored in the same batch (empty = off; see tta.py)
+    tta_variants: tuple[str, ...]
+    tta_aggregation: str
+    tta_crop_fraction: float
+
+    # /predict/batch limits: images per request, images per model call, preprocessing threads
+    batch_predict_max_images: int
+    batch_predict_chunk: int
+    batch_predict_workers: int
+
+    # Write-behind persistence of prediction records (queue + background insert_many)
+    prediction_write_behind: bool
+    prediction_write_queue_size: int
+    prediction_write_batch_size: int
+    prediction_write_interval_ms: int
+
+    # If true, every /predict upload is kept in the blob store (otherwise only on store_image)
     store_images_in_db: bool
+    # Content-addressed store for scan images ("local" or "none"); predictions reference them by sha256
+    blob_store: str
+    blob_store_dir: Path
     
     # Cloudinary settings for product images
     cloudinary_cloud_name: str | None
@@ -62,6 +110,23 @@ class Settings:
     paymongo_secret_key: str | None
     paymongo_public_key: str | None
 
+    # In-memory /predict result cache keyed by (image sha256, subject, model version)
+    prediction_cache: bool
+    prediction_cache_max_entries: int
+    prediction_cache_max_bytes: int
+    prediction_cache_ttl_seconds: float
+    # Also answer cache misses from recent documents in the predictions collection
+    prediction_cache_db_tier: bool
+
+    # Marketplace payloads cached per process and dropped on writes; 0 disables
+    featured_cache_ttl_seconds: float
+    category_cache_ttl_seconds: float
+
+    # Cross-request micro-batching of model inference
+    inference_batching: bool
+    inference_batch_max_size: int
+    inference_batch_max_wait_ms: float
+
 
 def _get_bool(name: str, default: bool) -> bool:
     value = os.getenv(name)
@@ -80,6 +145,16 @@ def _get_int(name: str, default: int) -> int:
         return default
 
 
+def _get_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
 def get_settings() -> Settings:
     mongodb_uri = os.getenv("MONGODB_URI")
 
@@ -92,11 +167,50 @@ def get_settings() -> Settings:
         debug=_get_bool("FLASK_DEBUG", True),
         fruit_model_path=Path(os.getenv("FRUIT_MODEL_PATH", str(BACKEND_DIR / "model" / "fruit_model.h5"))),
         leaf_model_path=Path(os.getenv("LEAF_MODEL_PATH", str(BACKEND_DIR / "model" / "leaf_model.h5"))),
+        inference_backend=os.getenv("INFERENCE_BACKEND", "keras").strip().lower(),
+        tflite_variant=os.getenv("TFLITE_VARIANT", "fp16").strip().lower(),
+        model_warmup=_get_bool("MODEL_WARMUP", False),
+        model_server_address=os.getenv("MODEL_SERVER_ADDRESS") or None,
+        model_server_authkey=os.getenv("MODEL_SERVER_AUTHKEY") or None,
+        model_server_concurrency=_get_int("MODEL_SERVER_CONCURRENCY", 1),
+        model_calibration=_get_bool("MODEL_CALIBRATION", True),
+        analysis_max_side=_get_int("ANALYSIS_MAX_SIDE", 1280),
+        enhancement_preset=os.getenv("ENHANCEMENT_PRESET", "full").strip().lower(),
+        enhancement_mode=os.getenv("ENHANCEMENT_MODE", "always").strip().lower(),
+        enhancement_working_size=_get_int("ENHANCEMENT_WORKING_SIZE", 224),
+        inference_cascade=_get_bool("INFERENCE_CASCADE", False),
+        # Defaults to BIGNAY_CONFIDENCE_THRESHOLD in app.py
+        # CASCADE_CONFIDENCE_THRESHOLD is the pre-split name, still honoured for fruit
+        cascade_fruit_threshold=_get_float("CASCADE_FRUIT_THRESHOLD", _get_float("CASCADE_CONFIDENCE_THRESHOLD", 0.45)),
+        cascade_leaf_threshold=_get_float("CASCADE_LEAF_THRESHOLD", 0.75),
+        # e.g. TTA_VARIANTS=hflip,crop,enhanced
+        tta_variants=tuple(v.strip().lower() for v in os.getenv("TTA_VARIANTS", "").split(",") if v.strip()),
+        tta_aggregation=os.getenv("TTA_AGGREGATION", "mean").strip().lower(),
+        tta_crop_fraction=_get_float("TTA_CROP_FRACTION", 0.8),
+        batch_predict_max_images=_get_int("BATCH_PREDICT_MAX_IMAGES", 50),
+        batch_predict_chunk=_get_int("BATCH_PREDICT_CHUNK", 8),
+        batch_predict_workers=_get_int("BATCH_PREDICT_WORKERS", min(8, os.cpu_count() or 1)),
+        prediction_write_behind=_get_bool("PREDICTION_WRITE_BEHIND", False),
+        prediction_write_queue_size=_get_int("PREDICTION_WRITE_QUEUE_SIZE", 1000),
+        prediction_write_batch_size=_get_int("PREDICTION_WRITE_BATCH_SIZE", 100),
+        prediction_write_interval_ms=_get_int("PREDICTION_WRITE_INTERVAL_MS", 500),
         store_images_in_db=_get_bool("STORE_IMAGES_IN_DB", False),
+        blob_store=os.getenv("BLOB_STORE", "local"),
+        blob_store_dir=Path(os.getenv("BLOB_STORE_DIR", str(BACKEND_DIR / "storage" / "scans"))),
         cloudinary_cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
         cloudinary_api_key=os.getenv("CLOUDINARY_API_KEY"),
         cloudinary_api_secret=os.getenv("CLOUDINARY_API_SECRET"),
         jwt_secret=os.getenv("JWT_SECRET", "bignay-secret-key-change-in-production"),
         paymongo_secret_key=os.getenv("PAYMONGO_SECRET_KEY"),
         paymongo_public_key=os.getenv("PAYMONGO_PUBLIC_KEY"),
+        prediction_cache=_get_bool("PREDICTION_CACHE", True),
+        prediction_cache_max_entries=_get_int("PREDICTION_CACHE_MAX_ENTRIES", 512),
+        prediction_cache_max_bytes=_get_int("PREDICTION_CACHE_MAX_BYTES", 32 * 1024 * 1024),
+        prediction_cache_ttl_seconds=_get_float("PREDICTION_CACHE_TTL_SECONDS", 600.0),
+        prediction_cache_db_tier=_get_bool("PREDICTION_CACHE_DB_TIER", False),
+        featured_cache_ttl_seconds=_get_float("FEATURED_CACHE_TTL_SECONDS", 60.0),
+        category_cache_ttl_seconds=_get_float("CATEGORY_CACHE_TTL_SECONDS", 300.0),
+        inference_batching=_get_bool("INFERENCE_BATCHING", False),
+        inference_batch_max_size=_get_int("INFERENCE_BATCH_MAX_SIZE", 8),
+        inference_batch_max_wait_ms=_get_float("INFERENCE_BATCH_MAX_WAIT_MS", 5.0),
     )
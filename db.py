@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import queue
+import threading
+import time
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Any
 
 
@@ -12,8 +15,62 @@ class DbStatus:
     message: str
 
 
+@dataclass
+class PredictionPage:
+    items: list[dict[str, Any]]
+    # Opaque keyset cursor for the next (older) page; None when this is the last page
+    next_cursor: str | None
+
+
+# Large blobs left out of /predictions unless explicitly requested
+IMAGE_FIELDS = ("image_data_url",)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # pymongo returns naive datetimes that are already UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def encode_cursor(created_at: datetime, object_id: Any) -> str:
+    """``<createdAt epoch ms>_<ObjectId hex>`` - MongoDB stores dates at millisecond precision."""
+    millis = int(_as_utc(created_at).timestamp() * 1000)
+    return f"{millis}_{object_id}"
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, Any]:
+    from bson import ObjectId  # lazy import
+    from bson.errors import InvalidId  # lazy import
+
+    millis, sep, object_id = cursor.partition("_")
+    try:
+        if not sep:
+            raise ValueError
+        return datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc), ObjectId(object_id)
+    except (ValueError, OverflowError, InvalidId):
+        raise ValueError(f"Invalid cursor: {cursor!r}") from None
+
+
 class PredictionStore:
-    def __init__(self, mongodb_uri: str | None, db_name: str, collection_name: str):
+    """MongoDB persistence for /predict records.
+
+    With ``write_behind`` enabled, insert_prediction() only assigns an ``_id`` and
+    enqueues the document; a background thread flushes the queue with
+    ``insert_many(ordered=False)`` every ``batch_size`` documents or ``flush_interval``
+    seconds. When the queue is full the caller waits up to ``put_timeout`` seconds and
+    then writes synchronously, so a slow database pushes back instead of losing data.
+    """
+
+    def __init__(
+        self,
+        mongodb_uri: str | None,
+        db_name: str,
+        collection_name: str,
+        write_behind: bool = False,
+        queue_size: int = 1000,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        put_timeout: float = 1.0,
+    ):
         self._enabled = bool(mongodb_uri)
         self._mongodb_uri = mongodb_uri
         self._db_name = db_name
@@ -22,10 +79,29 @@ class PredictionStore:
         self._client = None
         self._collection = None
 
+        self._write_behind = write_behind and self._enabled
+        self._queue: queue.Queue[dict[str, Any] | None] = queue.Queue(maxsize=max(1, queue_size))
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = max(0.0, flush_interval)
+        self._put_timeout = max(0.0, put_timeout)
+        self._writer: threading.Thread | None = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+
+        self._written = 0
+        self._failed = 0
+        self._flushes = 0
+        self._sync_fallbacks = 0
+        self._last_error: str | None = None
+
     @property
     def enabled(self) -> bool:
         return self._enabled
 
+    @property
+    def write_behind(self) -> bool:
+        return self._write_behind
+
     def connect(self) -> None:
         if not self._enabled:
             return
@@ -42,6 +118,17 @@ class PredictionStore:
         # Touch the server to surface connection errors early
         self._client.admin.command("ping")
 
+        # Lookup index for the prediction cache's MongoDB tier
+        self._collection.create_index(
+            [("image_sha256", 1), ("subject", 1), ("model_version", 1), ("createdAt", -1)]
+        )
+        # Keyset pagination for /predictions, unfiltered and with subject/result filters
+        self._collection.create_index([("createdAt", -1), ("_id", -1)])
+        self._collection.create_index([("subject", 1), ("result", 1), ("createdAt", -1), ("_id", -1)])
+        # ?subject= alone: the index above can't give createdAt order without a result equality
+        self._collection.create_index([("subject", 1), ("createdAt", -1), ("_id", -1)])
+        self._collection.create_index([("result", 1), ("createdAt", -1), ("_id", -1)])
+
     def status(self) -> DbStatus:
         if not self._enabled:
             return DbStatus(enabled=False, ok=True, message="MongoDB disabled (MONGODB_URI not set)")
@@ -56,29 +143,192 @@ class PredictionStore:
         if not self._enabled:
             return None
 
-        self.connect()
-        assert self._collection is not None
-
         doc = dict(doc)
         doc.setdefault("createdAt", datetime.now(timezone.utc))
 
+        if self._write_behind and not self._closed:
+            from bson import ObjectId  # lazy import
+
+            # Assign the id up front so callers get it without waiting for the write
+            doc.setdefault("_id", ObjectId())
+            self._ensure_writer()
+            try:
+                self._queue.put(doc, timeout=self._put_timeout)
+                return str(doc["_id"])
+            except queue.Full:
+                with self._writer_lock:
+                    self._sync_fallbacks += 1
+
+        self.connect()
+        assert self._collection is not None
+
         result = self._collection.insert_one(doc)
         return str(result.inserted_id)
 
-    def list_predictions(self, limit: int = 50) -> list[dict[str, Any]]:
+    def _ensure_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name="prediction-writer", daemon=True)
+                self._writer.start()
+
+    def _run_writer(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: list[dict[str, Any]] = []
+            deadline = time.monotonic() + self._flush_interval
+            while len(batch) < self._batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    doc = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if doc is None:
+                    # Shutdown sentinel: drain whatever is left and exit
+                    stopping = True
+                    while True:
+                        try:
+                            doc = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if doc is not None:
+                            batch.append(doc)
+                    break
+                batch.append(doc)
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: list[dict[str, Any]]) -> None:
+        from pymongo.errors import BulkWriteError  # lazy import
+
+        try:
+            self.connect()
+            assert self._collection is not None
+            self._collection.insert_many(batch, ordered=False)
+            written, error = len(batch), None
+        except BulkWriteError as e:
+            # ordered=False: everything except the reported documents was written
+            failed = len(e.details.get("writeErrors", []))
+            written, error = len(batch) - failed, str(e)
+        except Exception as e:  # pylint: disable=broad-except
+            written, error = 0, str(e)
+
+        with self._writer_lock:
+            self._flushes += 1
+            self._written += written
+            self._failed += len(batch) - written
+            if error is not None:
+                self._last_error = error
+        if error is not None:
+            print(f"✗ Prediction write-behind flush failed for {len(batch) - written} record(s): {error}")
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush queued records and stop the write-behind thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join(timeout)
+
+    def write_stats(self) -> dict[str, Any]:
+        with self._writer_lock:
+            return {
+                "write_behind": self._write_behind,
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "written": self._written,
+                "failed": self._failed,
+                "flushes": self._flushes,
+                "sync_fallbacks": self._sync_fallbacks,
+                "last_error": self._last_error,
+            }
+
+    def find_recent_prediction(
+        self, image_sha256: str, subject: str, model_version: str, max_age_seconds: float
+    ) -> dict[str, Any] | None:
+        """Newest prediction for the same image/subject/model within max_age_seconds, if any."""
+        if not self._enabled:
+            return None
+
+        self.connect()
+        assert self._collection is not None
+
+        since = datetime.now(timezone.utc) - timedelta(seconds=max_age_seconds)
+        return self._collection.find_one(
+            {
+                "image_sha256": image_sha256,
+                "subject": subject,
+                "model_version": model_version,
+                "createdAt": {"$gte": since},
+            },
+            projection={"_id": 0, "image_data_url": 0, "client": 0},
+            sort=[("createdAt", -1)],
+        )
+
+    def list_predictions(
+        self,
+        limit: int = 50,
+        cursor: str | None = None,
+        subject: str | None = None,
+        result: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        include_images: bool = False,
+    ) -> PredictionPage:
+        """Newest-first page of predictions using a ``(createdAt, _id)`` keyset.
+
+        ``cursor`` is the ``next_cursor`` of the previous page. ``since`` is inclusive,
+        ``until`` exclusive. Raises ValueError for a malformed cursor.
+        """
         if not self._enabled:
-            return []
+            return PredictionPage(items=[], next_cursor=None)
+
+        limit = max(1, min(limit, 200))
+        query: dict[str, Any] = {}
+        if subject:
+            query["subject"] = subject
+        if result:
+            query["result"] = result
+        if since or until:
+            query["createdAt"] = {}
+            if since:
+                query["createdAt"]["$gte"] = since
+            if until:
+                query["createdAt"]["$lt"] = until
+        if cursor:
+            created_at, object_id = decode_cursor(cursor)
+            after = {
+                "$or": [
+                    {"createdAt": {"$lt": created_at}},
+                    {"createdAt": created_at, "_id": {"$lt": object_id}},
+                ]
+            }
+            query = {"$and": [query, after]} if query else after
 
         self.connect()
         assert self._collection is not None
 
-        cursor = self._collection.find({}, sort=[("createdAt", -1)], limit=max(1, min(limit, 200)))
+        projection = None if include_images else {field: 0 for field in IMAGE_FIELDS}
+        # Fetch one extra row to know whether another page exists
+        docs = list(
+            self._collection.find(
+                query, projection=projection, sort=[("createdAt", -1), ("_id", -1)], limit=limit + 1
+            )
+        )
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            last = docs[-1]
+            next_cursor = encode_cursor(last["createdAt"], last["_id"])
+
         items: list[dict[str, Any]] = []
-        for item in cursor:
+        for item in docs:
             # ObjectId and datetime are not JSON serializable by default
             item["_id"] = str(item.get("_id"))
             created_at = item.get("createdAt")
             if isinstance(created_at, datetime):
-                item["createdAt"] = created_at.astimezone(timezone.utc).isoformat()
+                item["createdAt"] = _as_utc(created_at).isoformat()
             items.append(item)
-        return items
+        return PredictionPage(items=items, next_cursor=next_cursor)
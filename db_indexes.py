@@ -0,0 +1,321 @@
+"""
+Bignay Marketplace Indexes
+==========================
+Declares the MongoDB indexes for the marketplace collections, one entry per
+query shape the routes actually run, and applies them at startup.
+
+Compound keys follow equality -> sort -> range order so a filtered, sorted,
+paginated listing walks the index in order and stops after ``skip + limit``
+entries instead of scanning and sorting the whole collection in memory.
+
+Usage:
+    python db_indexes.py            # create any missing indexes
+    python db_indexes.py --explain  # explain() representative queries, report COLLSCAN / in-memory SORT
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass, field
+from typing import Any
+
+from pymongo.errors import OperationFailure
+
+ASC, DESC = 1, -1
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    keys: list[tuple[str, Any]]
+    reason: str  # the route/query shape this index serves
+    options: dict[str, Any] = field(default_factory=dict)
+
+
+# collection name -> indexes. Names are left to MongoDB's defaults so re-running
+# against a database built by the old init code is a no-op for unchanged keys.
+INDEXES: dict[str, list[IndexSpec]] = {
+    "users": [
+        IndexSpec([("email", ASC)], "login / signup lookup", {"unique": True}),
+    ],
+    "products": [
+        IndexSpec([("name", "text"), ("description", "text"), ("tags", "text")], "GET /products ?search= ($text)"),
+        IndexSpec([("search_tokens", ASC)], "GET /products ?search_mode=prefix"),
+        IndexSpec([("is_active", ASC), ("created_at", DESC)], "GET /products default sort, /featured recently_added"),
+        IndexSpec(
+            [("is_active", ASC), ("category", ASC), ("created_at", DESC)],
+            "GET /products ?category=, /categories counts",
+        ),
+        IndexSpec([("is_active", ASC), ("price", ASC)], "GET /products ?sort=price, min/max_price"),
+        IndexSpec([("is_active", ASC), ("sales_count", DESC)], "GET /products ?sort=sales, /featured most_popular"),
+        IndexSpec([("is_active", ASC), ("average_rating", DESC)], "GET /products ?sort=rating, /featured top_rated"),
+        IndexSpec([("is_active", ASC), ("views", DESC)], "GET /products ?sort=views, /featured trending"),
+        IndexSpec([("seller_id", ASC), ("created_at", DESC)], "GET /products/user/my-products"),
+        IndexSpec([("created_at", DESC)], "GET /products/admin/all without is_active filter"),
+    ],
+    "reviews": [
+        IndexSpec(
+            [("product_id", ASC), ("is_active", ASC), ("created_at", DESC)],
+            "latest active review per product, product review pages",
+        ),
+        IndexSpec([("user_id", ASC)], "reviews by user"),
+    ],
+    "orders": [
+        IndexSpec([("user_id", ASC), ("created_at", DESC)], "GET /orders (current user), admin ?user_id="),
+        IndexSpec([("status", ASC), ("created_at", DESC)], "GET /orders/admin/all ?status=, /admin/stats counts"),
+        IndexSpec([("created_at", DESC)], "GET /orders/admin/all without filters"),
+    ],
+    "forum": [
+        IndexSpec([("title", "text"), ("content", "text")], "forum full-text search"),
+        IndexSpec(
+            [("is_published", ASC), ("is_pinned", DESC), ("published_at", DESC)],
+            "GET /forum/posts (pinned first), /featured pinned",
+        ),
+        IndexSpec(
+            [("is_published", ASC), ("category", ASC), ("is_pinned", DESC), ("published_at", DESC)],
+            "GET /forum/posts ?category=",
+        ),
+        IndexSpec(
+            [("is_published", ASC), ("category", ASC), ("published_at", DESC)],
+            "/forum/featured latest per category, /categories counts",
+        ),
+        IndexSpec([("is_published", ASC), ("is_featured", ASC), ("published_at", DESC)], "/forum/featured featured"),
+        IndexSpec([("created_at", DESC)], "GET /forum/admin/posts"),
+    ],
+    "harvest_pins": [
+        IndexSpec([("is_active", ASC), ("created_at", DESC)], "GET /heatmap/pins, /stats total"),
+        IndexSpec([("is_active", ASC), ("pin_type", ASC), ("created_at", DESC)], "GET /heatmap/pins ?pin_type=, /stats"),
+        IndexSpec([("is_active", ASC), ("latitude", ASC), ("longitude", ASC)], "GET /heatmap/pins ?lat=&lng= bounding box"),
+        IndexSpec([("created_by", ASC), ("is_active", ASC), ("created_at", DESC)], "GET /heatmap/my-pins"),
+    ],
+}
+
+
+@dataclass(frozen=True)
+class ExplainQuery:
+    name: str
+    collection: str
+    filter: dict[str, Any]
+    sort: list[tuple[str, Any]] | None = None
+    limit: int = 20
+
+
+# Representative shapes from routes/products.py, orders.py, forum.py and heatmap.py
+EXPLAIN_QUERIES: list[ExplainQuery] = [
+    ExplainQuery("products: listing", "products", {"is_active": True}, [("created_at", DESC)]),
+    ExplainQuery(
+        "products: listing by category", "products", {"is_active": True, "category": "fruits"}, [("created_at", DESC)]
+    ),
+    ExplainQuery(
+        "products: price range, sort=price",
+        "products",
+        {"is_active": True, "price": {"$gte": 10, "$lte": 500}},
+        [("price", ASC)],
+    ),
+    ExplainQuery(
+        "products: featured most_popular",
+        "products",
+        {"is_active": True, "stock": {"$gt": 0}},
+        [("sales_count", DESC)],
+        10,
+    ),
+    ExplainQuery(
+        "products: featured top_rated",
+        "products",
+        {"is_active": True, "stock": {"$gt": 0}, "review_count": {"$gt": 0}},
+        [("average_rating", DESC)],
+        10,
+    ),
+    ExplainQuery(
+        "products: prefix search",
+        "products",
+        {"is_active": True, "$and": [{"search_tokens": {"$regex": "^bign"}}]},
+        [("created_at", DESC)],
+    ),
+    ExplainQuery("products: text search", "products", {"is_active": True, "$text": {"$search": "bignay"}}),
+    ExplainQuery("products: seller listing", "products", {"seller_id": "seller"}, [("created_at", DESC)]),
+    ExplainQuery(
+        "reviews: latest per product",
+        "reviews",
+        {"product_id": {"$in": ["a", "b"]}, "is_active": True},
+        [("product_id", ASC), ("created_at", DESC)],
+    ),
+    ExplainQuery("orders: my orders", "orders", {"user_id": "user"}, [("created_at", DESC)]),
+    ExplainQuery(
+        "orders: my orders by status", "orders", {"user_id": "user", "status": "pending"}, [("created_at", DESC)]
+    ),
+    ExplainQuery("orders: admin by status", "orders", {"status": "pending"}, [("created_at", DESC)]),
+    ExplainQuery(
+        "forum: listing", "forum", {"is_published": True}, [("is_pinned", DESC), ("published_at", DESC)], 10
+    ),
+    ExplainQuery(
+        "forum: listing by category",
+        "forum",
+        {"is_published": True, "category": "general"},
+        [("is_pinned", DESC), ("published_at", DESC)],
+        10,
+    ),
+    ExplainQuery(
+        "forum: featured by category",
+        "forum",
+        {"is_published": True, "category": "general"},
+        [("published_at", DESC)],
+        3,
+    ),
+    ExplainQuery(
+        "forum: featured posts", "forum", {"is_published": True, "is_featured": True}, [("published_at", DESC)], 5
+    ),
+    ExplainQuery("heatmap: pins", "harvest_pins", {"is_active": True}, [("created_at", DESC)], 100),
+    ExplainQuery(
+        "heatmap: pins by type",
+        "harvest_pins",
+        {"is_active": True, "pin_type": "farm"},
+        [("created_at", DESC)],
+        100,
+    ),
+    ExplainQuery(
+        "heatmap: bounding box",
+        "harvest_pins",
+        {"is_active": True, "latitude": {"$gte": 14.0, "$lte": 15.0}, "longitude": {"$gte": 120.5, "$lte": 121.5}},
+        [("created_at", DESC)],
+        100,
+    ),
+    ExplainQuery("heatmap: my pins", "harvest_pins", {"created_by": "user", "is_active": True}, [("created_at", DESC)]),
+]
+
+
+def _text_fields(keys: Any) -> set[str]:
+    return {name for name, kind in keys if kind == "text"}
+
+
+def _replace_text_index(collection, spec: IndexSpec, info: dict[str, Any]) -> str | None:
+    """Drop an existing text index over different fields so ``spec`` can replace it.
+
+    A collection can only have one text index, so widening its fields (e.g. adding
+    tags) would otherwise be a permanent conflict. Returns the dropped index name.
+    """
+    wanted = _text_fields(spec.keys)
+    if not wanted:
+        return None
+    for name, index in info.items():
+        # The server reports text indexes as _fts/_ftsx keys plus a weights map
+        fields = set(index.get("weights") or {}) or _text_fields(index.get("key", []))
+        if fields and fields != wanted:
+            collection.drop_index(name)
+            return name
+    return None
+
+
+def ensure_indexes(db) -> dict[str, Any]:
+    """Create every declared index that is missing; existing ones are left untouched.
+
+    create_index is a no-op for an identical key pattern and options, so this is safe
+    to run on every startup. A text index over different fields is dropped and rebuilt;
+    any other conflicting definition (same keys, different options) is reported
+    instead of aborting the rest.
+    """
+    created: list[str] = []
+    replaced: list[str] = []
+    conflicts: list[str] = []
+    for collection_name, specs in INDEXES.items():
+        collection = db[collection_name]
+        info = collection.index_information()
+        existing = set(info)
+        for spec in specs:
+            try:
+                dropped = _replace_text_index(collection, spec, info)
+                if dropped is not None:
+                    replaced.append(f"{collection_name}.{dropped}")
+                    existing.discard(dropped)
+                name = collection.create_index(spec.keys, **spec.options)
+            except OperationFailure as e:
+                conflicts.append(f"{collection_name}.{spec.keys}: {e}")
+                continue
+            if name not in existing:
+                created.append(f"{collection_name}.{name}")
+                existing.add(name)
+    return {"created": created, "replaced": replaced, "conflicts": conflicts}
+
+
+def _plan_stages(plan: Any) -> list[dict[str, Any]]:
+    # Newer servers nest the classic tree under "queryPlan" and may use "inputStages"
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan)
+        for key in ("queryPlan", "inputStage"):
+            stages.extend(_plan_stages(plan.get(key)))
+        for child in plan.get("inputStages", []):
+            stages.extend(_plan_stages(child))
+    return stages
+
+
+def explain_query(db, query: ExplainQuery) -> dict[str, Any]:
+    cursor = db[query.collection].find(query.filter)
+    if query.sort:
+        cursor = cursor.sort(query.sort)
+    explain = cursor.limit(query.limit).explain()
+    stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+    names = [stage["stage"] for stage in stages]
+    stats = explain.get("executionStats", {})
+    return {
+        "name": query.name,
+        "collection": query.collection,
+        "collscan": "COLLSCAN" in names,
+        "in_memory_sort": "SORT" in names,
+        "indexes": [stage["indexName"] for stage in stages if "indexName" in stage],
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+    }
+
+
+def explain_report(db) -> list[dict[str, Any]]:
+    """explain() every representative query; flags collection scans and in-memory sorts."""
+    return [explain_query(db, query) for query in EXPLAIN_QUERIES]
+
+
+def main():
+    from pymongo import MongoClient
+
+    from config import get_settings
+
+    parser = argparse.ArgumentParser(description="Create marketplace indexes / explain their query shapes")
+    parser.add_argument("--explain", action="store_true", help="Report COLLSCAN and in-memory SORT plans")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    if not settings.mongodb_uri:
+        raise SystemExit("Set MONGODB_URI to manage indexes")
+    db = MongoClient(settings.mongodb_uri, serverSelectionTimeoutMS=5000)[settings.mongodb_db]
+
+    result = ensure_indexes(db)
+    for name in result["replaced"]:
+        print(f"✓ Dropped outdated text index {name}")
+    for name in result["created"]:
+        print(f"✓ Created index {name}")
+    for conflict in result["conflicts"]:
+        print(f"✗ Index conflict {conflict}")
+    if not result["created"] and not result["conflicts"]:
+        print("✓ All marketplace indexes present")
+
+    if not args.explain:
+        return
+
+    collscans = 0
+    for row in explain_report(db):
+        if row["collscan"]:
+            collscans += 1
+        mark = "✗" if row["collscan"] or row["in_memory_sort"] else "✓"
+        plan = "COLLSCAN" if row["collscan"] else ", ".join(row["indexes"]) or "-"
+        if row["in_memory_sort"]:
+            plan += " + SORT"
+        print(
+            f"{mark} {row['name']:<36} {plan:<60} "
+            f"keys={row['keys_examined']} docs={row['docs_examined']} returned={row['returned']}"
+        )
+    if collscans:
+        raise SystemExit(f"{collscans} representative queries use a collection scan")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,104 @@
 from __future__ import annotations
 
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
 import numpy as np
 
 from utils_image import ImageFeatures
 
+# Class order must match train_model.py
+FRUIT_CLASSES = ["good", "mold", "overripe", "ripe", "unripe"]
+LEAF_CLASSES = ["healthy", "mold"]
+
 
 @dataclass(frozen=True)
 class ClassifierResult:
     class_name: str
     confidence: float
+    # Full probability vector in classifier class order; None for the heuristic fallbacks
+    probabilities: tuple[float, ...] | None = None
+
+
+def results_from_probabilities(probs: np.ndarray, classes: list[str]) -> list[ClassifierResult]:
+    """Top-1 ClassifierResult (with the full vector) for each row of an (N, num_classes) matrix."""
+    idxs = np.argmax(probs, axis=1)
+    return [
+        ClassifierResult(
+            class_name=classes[int(idx)],
+            confidence=float(row[idx]),
+            probabilities=tuple(float(p) for p in row),
+        )
+        for idx, row in zip(idxs, probs)
+    ]
+
+
+def calibration_path(model_path: Path) -> Path:
+    """Temperature-scaling artifact written by train_model.py next to the model."""
+    return model_path.with_name(f"{model_path.stem}_calibration.json")
+
+
+def load_temperature(model_path: Path, classes: list[str]) -> float | None:
+    """Fitted softmax temperature for model_path, or None if there is no usable artifact."""
+    path = calibration_path(model_path)
+    if not path.exists():
+        return None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        temperature = float(data["temperature"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Warning: ignoring unreadable calibration {path.name}: {e}")
+        return None
+    if data.get("classes") not in (None, classes):
+        print(f"Warning: ignoring calibration {path.name}: class order {data['classes']} != {classes}")
+        return None
+    if temperature <= 0:
+        return None
+    print(f"Loaded calibration from {path} (temperature={temperature:.3f})")
+    return temperature
+
+
+def apply_temperature(probs: np.ndarray, temperature: float | None) -> np.ndarray:
+    """Temperature-scale softmax outputs: softmax(log(p) / T). A few vector ops per batch."""
+    if temperature is None or temperature == 1.0:
+        return probs
+    logits = np.log(np.clip(probs, 1e-12, None)) / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    scaled = np.exp(logits)
+    return (scaled / scaled.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def artifact_version(backend: str, candidates: list[Path], calibration_source: Path | None) -> str:
+    """"<backend>:<newest artifact mtime>[:cal<calibration mtime>]"; changes when any of them is replaced."""
+    stamp = max((p.stat().st_mtime_ns for p in candidates if p.exists()), default=0)
+    if calibration_source is not None:
+        calibration = calibration_path(calibration_source)
+        if calibration.exists():
+            # Recalibrating changes every confidence, so it is part of the version too
+            return f"{backend}:{stamp}:cal{calibration.stat().st_mtime_ns}"
+    return f"{backend}:{stamp}"
 
 
 class KerasClassifier:
-    def __init__(self, model_path: Path, classes: list[str]):
+    def __init__(self, model_path: Path, classes: list[str], input_size: int = 224, calibrate: bool = True):
         self._model_path = model_path
         self._classes = classes
+        self._input_size = input_size
+        self._calibrate = calibrate
+        # Softmax temperature from <model>_calibration.json, loaded once with the model
+        self._temperature: float | None = None
         self._model = None
+        # Traced direct-call path; None means fall back to Model.predict()
+        self._infer = None
+        self._load_lock = threading.Lock()
+        # Per-stage startup timings in milliseconds, filled by _load()/warm_up()
+        self._timings: dict[str, float] = {}
 
     @property
     def classes(self) -> list[str]:
@@ -30,32 +110,340 @@ class KerasClassifier:
         h5_path = self._model_path.with_suffix('.h5')
         return keras_path.exists() or h5_path.exists() or self._model_path.exists()
 
+    def version(self) -> str:
+        candidates = [self._model_path.with_suffix('.keras'), self._model_path.with_suffix('.h5'), self._model_path]
+        return artifact_version("keras", candidates, self._model_path if self._calibrate else None)
+
     def _load(self):
         if self._model is not None:
             return
-        import tensorflow as tf  # lazy import
+        with self._load_lock:
+            if self._model is not None:
+                return
 
-        # Try .keras format first (newer), then .h5 (legacy)
-        keras_path = self._model_path.with_suffix('.keras')
-        h5_path = self._model_path.with_suffix('.h5')
-        
-        if keras_path.exists():
-            self._model = tf.keras.models.load_model(str(keras_path))
-            print(f"Loaded model from {keras_path}")
-        elif h5_path.exists():
-            self._model = tf.keras.models.load_model(str(h5_path))
-            print(f"Loaded model from {h5_path}")
-        elif self._model_path.exists():
-            self._model = tf.keras.models.load_model(str(self._model_path))
-            print(f"Loaded model from {self._model_path}")
-        else:
-            raise FileNotFoundError(f"No model found at {self._model_path}")
+            start = time.perf_counter()
+            import tensorflow as tf  # lazy import
+            self._timings["import_ms"] = (time.perf_counter() - start) * 1000.0
+
+            # Try .keras format first (newer), then .h5 (legacy)
+            keras_path = self._model_path.with_suffix('.keras')
+            h5_path = self._model_path.with_suffix('.h5')
+
+            if keras_path.exists():
+                source = keras_path
+            elif h5_path.exists():
+                source = h5_path
+            elif self._model_path.exists():
+                source = self._model_path
+            else:
+                raise FileNotFoundError(f"No model found at {self._model_path}")
+
+            start = time.perf_counter()
+            model = tf.keras.models.load_model(str(source))
+            self._timings["load_ms"] = (time.perf_counter() - start) * 1000.0
+            print(f"Loaded model from {source}")
+
+            start = time.perf_counter()
+            self._infer = self._trace(tf, model)
+            self._timings["trace_ms"] = (time.perf_counter() - start) * 1000.0
+
+            if self._calibrate:
+                self._temperature = load_temperature(self._model_path, self._classes)
+
+            # Publish last so other threads never see a model without its traced path
+            self._model = model
+
+    def warm_up(self) -> dict[str, float]:
+        """Load the model and run one dummy inference; returns per-stage timings in ms."""
+        self._load()
+        start = time.perf_counter()
+        self.predict_batch(np.zeros((1, self._input_size, self._input_size, 3), dtype=np.float32))
+        self._timings["first_inference_ms"] = (time.perf_counter() - start) * 1000.0
+        return dict(self._timings)
+
+    def _trace(self, tf, model):
+        """Wrap the model in a tf.function with a fixed batch-polymorphic signature.
+
+        Model.predict() builds a tf.data pipeline and callback list on every call,
+        which dominates latency for a handful of images. A traced direct call skips
+        all of that. Returns None if tracing fails so predict() can be used instead.
+        """
+        size = self._input_size
+
+        try:
+            @tf.function(input_signature=[tf.TensorSpec(shape=(None, size, size, 3), dtype=tf.float32)])
+            def infer(x):
+                return model(x, training=False)
+
+            # Warm-up traces the graph once so the first request doesn't pay for it
+            infer(tf.zeros((1, size, size, 3), dtype=tf.float32))
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"Warning: traced inference unavailable for {self._model_path.name}, using predict(): {e}")
+            return None
+        return infer
+
+    def _forward(self, input_tensor: np.ndarray) -> np.ndarray:
+        if self._infer is not None:
+            return self._infer(np.asarray(input_tensor, dtype=np.float32)).numpy()
+        return self._model.predict(input_tensor, verbose=0)
 
     def predict(self, input_tensor: np.ndarray) -> ClassifierResult:
+        return self.predict_batch(input_tensor)[0]
+
+    @property
+    def temperature(self) -> float | None:
+        return self._temperature
+
+    def predict_proba(self, input_tensor: np.ndarray) -> np.ndarray:
+        """Run one forward pass over a stacked (N, H, W, 3) batch; (N, num_classes) softmax rows."""
         self._load()
-        preds = self._model.predict(input_tensor, verbose=0)[0]
-        idx = int(np.argmax(preds))
-        return ClassifierResult(class_name=self._classes[idx], confidence=float(np.max(preds)))
+        return apply_temperature(np.asarray(self._forward(input_tensor), dtype=np.float32), self._temperature)
+
+    def predict_batch(self, input_tensor: np.ndarray) -> list[ClassifierResult]:
+        """Run one forward pass over a stacked (N, H, W, 3) batch, one result per row."""
+        return results_from_probabilities(self.predict_proba(input_tensor), self._classes)
+
+
+class TFLiteClassifier:
+    """Runs an exported ``<model>_<variant>.tflite`` artifact with the KerasClassifier interface.
+
+    Uses ``tflite_runtime`` when installed (no full TensorFlow import), otherwise
+    ``tf.lite``. The interpreter is not thread-safe, so invocations are serialized.
+    """
+
+    def __init__(
+        self,
+        model_path: Path,
+        classes: list[str],
+        variant: str = "fp16",
+        num_threads: int | None = None,
+        calibrate: bool = True,
+    ):
+        self._model_path = model_path.with_name(f"{model_path.stem}_{variant}.tflite")
+        self._variant = variant
+        # Calibration is fitted on the Keras model and shared by its TFLite exports
+        self._calibration_source = model_path if calibrate else None
+        self._temperature: float | None = None
+        self._classes = classes
+        self._num_threads = num_threads
+        self._interpreter = None
+        self._input_index = 0
+        self._output_index = 0
+        self._batch_size = 0
+        self._lock = threading.Lock()
+        self._timings: dict[str, float] = {}
+
+    @property
+    def classes(self) -> list[str]:
+        return list(self._classes)
+
+    @property
+    def path(self) -> Path:
+        return self._model_path
+
+    def available(self) -> bool:
+        return self._model_path.exists()
+
+    def version(self) -> str:
+        return artifact_version(f"tflite-{self._variant}", [self._model_path], self._calibration_source)
+
+    def _load(self):
+        if self._interpreter is not None:
+            return
+        start = time.perf_counter()
+        try:
+            from tflite_runtime.interpreter import Interpreter  # lazy import
+        except ImportError:
+            import tensorflow as tf  # lazy import
+
+            Interpreter = tf.lite.Interpreter
+        self._timings["import_ms"] = (time.perf_counter() - start) * 1000.0
+
+        if not self._model_path.exists():
+            raise FileNotFoundError(f"No TFLite model found at {self._model_path}")
+
+        start = time.perf_counter()
+        self._interpreter = Interpreter(model_path=str(self._model_path), num_threads=self._num_threads)
+        self._interpreter.allocate_tensors()
+        self._input_index = self._interpreter.get_input_details()[0]["index"]
+        self._output_index = self._interpreter.get_output_details()[0]["index"]
+        self._batch_size = int(self._interpreter.get_input_details()[0]["shape"][0])
+        self._timings["load_ms"] = (time.perf_counter() - start) * 1000.0
+        print(f"Loaded TFLite model from {self._model_path}")
+
+        if self._calibration_source is not None:
+            self._temperature = load_temperature(self._calibration_source, self._classes)
+
+    def warm_up(self) -> dict[str, float]:
+        """Load the interpreter and run one dummy inference; returns per-stage timings in ms."""
+        with self._lock:
+            self._load()
+            shape = [int(d) for d in self._interpreter.get_input_details()[0]["shape"]]
+        shape[0] = 1
+        start = time.perf_counter()
+        self.predict_batch(np.zeros(shape, dtype=np.float32))
+        self._timings["first_inference_ms"] = (time.perf_counter() - start) * 1000.0
+        return dict(self._timings)
+
+    def predict(self, input_tensor: np.ndarray) -> ClassifierResult:
+        return self.predict_batch(input_tensor)[0]
+
+    def predict_batch(self, input_tensor: np.ndarray) -> list[ClassifierResult]:
+        return results_from_probabilities(self.predict_proba(input_tensor), self._classes)
+
+    def predict_proba(self, input_tensor: np.ndarray) -> np.ndarray:
+        input_tensor = np.ascontiguousarray(input_tensor, dtype=np.float32)
+        with self._lock:
+            self._load()
+            batch_size = input_tensor.shape[0]
+            if batch_size != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input_index, list(input_tensor.shape))
+                self._interpreter.allocate_tensors()
+                self._batch_size = batch_size
+            self._interpreter.set_tensor(self._input_index, input_tensor)
+            self._interpreter.invoke()
+            preds = self._interpreter.get_tensor(self._output_index).astype(np.float32)
+        return apply_temperature(preds, self._temperature)
+
+
+class MicroBatcher:
+    """Coalesces concurrent predict calls into one forward pass.
+
+    Request threads enqueue their tensors and block on a Future; a single worker
+    thread drains the queue and flushes once ``max_batch_size`` rows are waiting
+    or the oldest request has waited ``max_wait_ms``. Exposes the same
+    ``predict``/``predict_batch``/``predict_proba`` interface as the wrapped classifier.
+    """
+
+    def __init__(self, classifier: KerasClassifier, max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        self._classifier = classifier
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: queue.Queue[tuple[np.ndarray, Future, float]] = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        self._batches = 0
+        self._rows = 0
+        self._largest_batch = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def classes(self) -> list[str]:
+        return self._classifier.classes
+
+    def available(self) -> bool:
+        return self._classifier.available()
+
+    def version(self) -> str:
+        return self._classifier.version()
+
+    def warm_up(self) -> dict[str, float]:
+        return self._classifier.warm_up()
+
+    def predict(self, input_tensor: np.ndarray) -> ClassifierResult:
+        return self.predict_batch(input_tensor)[0]
+
+    def predict_batch(self, input_tensor: np.ndarray) -> list[ClassifierResult]:
+        return results_from_probabilities(self.predict_proba(input_tensor), self._classifier.classes)
+
+    def predict_proba(self, input_tensor: np.ndarray) -> np.ndarray:
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((input_tensor, future, time.perf_counter()))
+        return future.result()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            batches = self._batches
+            return {
+                "max_batch_size": self._max_batch_size,
+                "max_wait_ms": self._max_wait * 1000.0,
+                "queue_depth": self._queue.qsize(),
+                "batches": batches,
+                "rows": self._rows,
+                "avg_batch_size": round(self._rows / batches, 2) if batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "avg_wait_ms": round(self._wait_total / self._rows * 1000.0, 3) if self._rows else 0.0,
+                "max_wait_ms_observed": round(self._wait_max * 1000.0, 3),
+            }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> list[tuple[np.ndarray, Future, float]]:
+        pending = [self._queue.get()]
+        rows = pending[0][0].shape[0]
+        deadline = pending[0][2] + self._max_wait
+        while rows < self._max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            pending.append(item)
+            rows += item[0].shape[0]
+        return pending
+
+    def _run(self) -> None:
+        while True:
+            pending = self._collect()
+            started = time.perf_counter()
+            try:
+                batch = np.concatenate([tensor for tensor, _, _ in pending], axis=0)
+                results = self._classifier.predict_proba(batch)
+            except Exception as e:  # pylint: disable=broad-except
+                for _, future, _ in pending:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for tensor, future, _ in pending:
+                n = tensor.shape[0]
+                future.set_result(results[offset:offset + n])
+                offset += n
+
+            with self._lock:
+                self._batches += 1
+                self._rows += offset
+                self._largest_batch = max(self._largest_batch, offset)
+                for tensor, _, enqueued in pending:
+                    waited = started - enqueued
+                    self._wait_total += waited * tensor.shape[0]
+                    self._wait_max = max(self._wait_max, waited)
+
+
+def build_classifier(settings: Any, subject: str):
+    """Construct the configured in-process classifier for "fruit" or "leaf".
+
+    Picks the Keras or TFLite backend from ``settings.inference_backend`` and wraps
+    it in a MicroBatcher when ``settings.inference_batching`` is on.
+    """
+    if subject == "fruit":
+        model_path, classes = settings.fruit_model_path, FRUIT_CLASSES
+    else:
+        model_path, classes = settings.leaf_model_path, LEAF_CLASSES
+
+    if settings.inference_backend == "tflite":
+        classifier = TFLiteClassifier(
+            model_path, classes=classes, variant=settings.tflite_variant, calibrate=settings.model_calibration
+        )
+    else:
+        classifier = KerasClassifier(model_path, classes=classes, calibrate=settings.model_calibration)
+
+    if settings.inference_batching:
+        classifier = MicroBatcher(
+            classifier,
+            max_batch_size=settings.inference_batch_max_size,
+            max_wait_ms=settings.inference_batch_max_wait_ms,
+        )
+    return classifier
 
 
 class HeuristicFruitClassifier:
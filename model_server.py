@@ -0,0 +1,304 @@
+"""
+Bignay Model Server
+===================
+Hosts the fruit and leaf classifiers in a single process so that multi-process
+web servers don't load a copy of each model per worker.
+
+Web workers talk to it through ``RemoteClassifier``: the preprocessed input
+tensor is written into a pooled ``multiprocessing.shared_memory`` block and
+only its name and shape travel over the connection. The server reads the tensor
+in place, runs the configured backend (Keras/TFLite, optionally micro-batched)
+and returns plain ``(class_name, confidence)`` pairs or the probability matrix.
+
+Usage:
+    MODEL_SERVER_ADDRESS=127.0.0.1:6001 MODEL_SERVER_AUTHKEY=<secret> python model_server.py
+    MODEL_SERVER_ADDRESS=/tmp/bignay-models.sock MODEL_SERVER_AUTHKEY=<secret> python model_server.py
+
+MODEL_SERVER_AUTHKEY is required on both sides (e.g. ``python -c "import secrets; print(secrets.token_hex(32))"``);
+then start the web app with the same MODEL_SERVER_ADDRESS / MODEL_SERVER_AUTHKEY.
+"""
+
+from __future__ import annotations
+
+import atexit
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+from inference import ClassifierResult, results_from_probabilities
+
+
+def _parse_address(address: str) -> Any:
+    """"host:port" -> TCP tuple; anything else is treated as a Unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+def _attach(name: str) -> SharedMemory:
+    """Attach to a block created by a client without taking ownership of it."""
+    try:
+        return SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = SharedMemory(name=name)
+        # Older Pythons register attachments too and would unlink the client's block on exit
+        resource_tracker.unregister(shm._name, "shared_memory")  # pylint: disable=protected-access
+        return shm
+
+
+class _Channel:
+    """One server connection plus the shared-memory block its requests are written into."""
+
+    def __init__(self, address: Any, authkey: bytes):
+        self.conn = Client(address, authkey=authkey)
+        self.shm: SharedMemory | None = None
+
+    def buffer(self, nbytes: int) -> SharedMemory:
+        if self.shm is None or self.shm.size < nbytes:
+            self._unlink()
+            self.shm = SharedMemory(create=True, size=nbytes)
+        return self.shm
+
+    def _unlink(self) -> None:
+        if self.shm is not None:
+            try:
+                self.shm.close()
+                self.shm.unlink()
+            except (BufferError, FileNotFoundError):
+                pass
+            self.shm = None
+
+    def close(self) -> None:
+        self._unlink()
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+
+
+class RemoteClassifier:
+    """KerasClassifier-compatible client for a running model server.
+
+    Requests check a (connection, shared-memory block) channel out of a small pool
+    and return it afterwards, so concurrent requests never share a channel and the
+    number of sockets and /dev/shm blocks stays bounded by ``pool_size`` even when
+    the web server starts a new thread per request.
+    """
+
+    def __init__(self, address: str, subject: str, classes: list[str], authkey: str | None, pool_size: int = 4):
+        if not authkey:
+            raise ValueError("MODEL_SERVER_AUTHKEY must be set to use the model server")
+        self._address = _parse_address(address)
+        self._subject = subject
+        self._classes = classes
+        self._authkey = authkey.encode()
+        self._pool_size = max(1, pool_size)
+        self._idle: list[_Channel] = []
+        self._pool_lock = threading.Lock()
+        self._available: bool | None = None
+        self._version: str | None = None
+        atexit.register(self._close_all)
+
+    @property
+    def classes(self) -> list[str]:
+        return list(self._classes)
+
+    def _checkout(self) -> _Channel:
+        with self._pool_lock:
+            if self._idle:
+                return self._idle.pop()
+        return _Channel(self._address, self._authkey)
+
+    def _checkin(self, channel: _Channel) -> None:
+        with self._pool_lock:
+            if len(self._idle) < self._pool_size:
+                self._idle.append(channel)
+                return
+        channel.close()
+
+    def _close_all(self) -> None:
+        with self._pool_lock:
+            idle, self._idle = self._idle, []
+        for channel in idle:
+            channel.close()
+
+    def _call(self, message_for: Any) -> Any:
+        """Send ``message_for(channel)`` on a pooled channel and return the payload.
+
+        Reconnects once if the server was restarted since the channel was last used;
+        a channel that failed mid-call is closed rather than returned to the pool.
+        """
+        for attempt in (0, 1):
+            channel = self._checkout()
+            try:
+                channel.conn.send(message_for(channel))
+                status, payload = channel.conn.recv()
+            except (EOFError, OSError):
+                channel.close()
+                if attempt:
+                    raise
+                continue
+            except BaseException:
+                channel.close()
+                raise
+            self._checkin(channel)
+            break
+        if status != "ok":
+            raise RuntimeError(f"Model server error: {payload}")
+        return payload
+
+    def available(self) -> bool:
+        # A positive answer is cached; an unreachable server falls back to heuristics
+        if self._available:
+            return True
+        try:
+            self._available = bool(self._call(lambda _: ("available", self._subject)))
+        except (OSError, EOFError, RuntimeError):
+            return False
+        return self._available
+
+    def version(self) -> str:
+        # The server owns the model files, so it reports the version; asked once per process
+        if self._version is None:
+            self._version = str(self._call(lambda _: ("version", self._subject)))
+        return self._version
+
+    def warm_up(self) -> dict[str, float]:
+        return self._call(lambda _: ("warm_up", self._subject))
+
+    def predict(self, input_tensor: np.ndarray) -> ClassifierResult:
+        return self.predict_batch(input_tensor)[0]
+
+    @staticmethod
+    def _share(channel: _Channel, input_tensor: np.ndarray) -> tuple[str, tuple[int, ...]]:
+        shm = channel.buffer(input_tensor.nbytes)
+        view = np.ndarray(input_tensor.shape, dtype=np.float32, buffer=shm.buf)
+        view[...] = input_tensor
+        del view
+        return shm.name, input_tensor.shape
+
+    def predict_batch(self, input_tensor: np.ndarray) -> list[ClassifierResult]:
+        return results_from_probabilities(self.predict_proba(input_tensor), self._classes)
+
+    def predict_proba(self, input_tensor: np.ndarray) -> np.ndarray:
+        # The (N, num_classes) result is small enough to send back over the connection
+        input_tensor = np.asarray(input_tensor, dtype=np.float32)
+        return self._call(lambda channel: ("predict_proba", self._subject, *self._share(channel, input_tensor)))
+
+
+class ModelServer:
+    """Owns the classifiers and serves RemoteClassifier requests.
+
+    One thread per client connection; actual model calls are bounded by a
+    semaphore so inference concurrency is controlled here, not by worker count.
+    """
+
+    def __init__(self, models: dict[str, Any], address: str, authkey: str | None, concurrency: int = 1):
+        if not authkey:
+            raise ValueError("MODEL_SERVER_AUTHKEY must be set to run the model server")
+        self._models = models
+        self._address = _parse_address(address)
+        self._authkey = authkey.encode()
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+
+    def serve_forever(self) -> None:
+        # The default backlog of 1 refuses connections when many workers start at once
+        with Listener(self._address, backlog=64, authkey=self._authkey) as listener:
+            print(f"✓ Model server listening on {listener.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:  # pylint: disable=broad-except
+                    print(f"✗ Rejected model server connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def _serve_connection(self, conn) -> None:
+        attached: dict[str, SharedMemory] = {}
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    conn.send(("ok", self._handle(message, attached)))
+                except Exception as e:  # pylint: disable=broad-except
+                    conn.send(("error", str(e)))
+        finally:
+            for shm in attached.values():
+                shm.close()
+            conn.close()
+
+    def _handle(self, message: tuple, attached: dict[str, SharedMemory]) -> Any:
+        op, subject = message[0], message[1]
+        model = self._models.get(subject)
+        if model is None:
+            raise ValueError(f"Unknown subject: {subject}")
+
+        if op == "available":
+            return model.available()
+
+        if op == "version":
+            return model.version()
+
+        if op == "warm_up":
+            with self._slots:
+                return model.warm_up()
+
+        if op in ("predict", "predict_proba"):
+            name, shape = message[2], tuple(message[3])
+            shm = attached.get(name)
+            if shm is None:
+                # The client replaces its block when it needs a bigger one; drop the stale one
+                for old in attached.values():
+                    old.close()
+                attached.clear()
+                shm = attached[name] = _attach(name)
+            input_tensor = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            try:
+                with self._slots:
+                    if op == "predict_proba":
+                        return model.predict_proba(input_tensor)
+                    results = model.predict_batch(input_tensor)
+            finally:
+                del input_tensor
+            return [(r.class_name, r.confidence) for r in results]
+
+        raise ValueError(f"Unknown operation: {op}")
+
+
+def main():
+    from config import get_settings
+    from inference import build_classifier
+
+    settings = get_settings()
+    if not settings.model_server_address:
+        raise SystemExit("Set MODEL_SERVER_ADDRESS (host:port or socket path) to run the model server")
+    if not settings.model_server_authkey:
+        # Connections are authenticated with this key and then unpickled; never run with a guessable one
+        raise SystemExit("Set MODEL_SERVER_AUTHKEY to a long random secret to run the model server")
+
+    models = {"fruit": build_classifier(settings, "fruit"), "leaf": build_classifier(settings, "leaf")}
+    for name, model in models.items():
+        if model.available():
+            print(f"✓ {name} model warmed up: {model.warm_up()}")
+        else:
+            print(f"✗ {name} model not available - clients will use heuristics")
+
+    server = ModelServer(
+        models,
+        settings.model_server_address,
+        settings.model_server_authkey,
+        concurrency=settings.model_server_concurrency,
+    )
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,52 @@ Defines the product schema for marketplace
 """
 
 from __future__ import annotations
+import re
+import unicodedata
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Optional, List
 
 
+_TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_search_tokens(*texts: str) -> List[str]:
+    """Lowercase, accent-stripped, de-duplicated word tokens for prefix search"""
+    tokens = []
+    for text in texts:
+        if not text:
+            continue
+        folded = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii').lower()
+        tokens.extend(t for t in _TOKEN_SPLIT.split(folded) if t)
+    return list(dict.fromkeys(tokens))
+
+
+def product_search_tokens(data: dict) -> List[str]:
+    """search_tokens for a product document: words of its name, category and tags"""
+    return normalize_search_tokens(data.get('name', ''), data.get('category', ''), *(data.get('tags') or []))
+
+
+# Fields that feed search_tokens; updating any of them must refresh the tokens
+SEARCH_TOKEN_FIELDS = frozenset({'name', 'category', 'tags'})
+
+
+def backfill_search_tokens(collection, batch_size: int = 500) -> int:
+    """Populate search_tokens on products created before the field existed"""
+    from pymongo import UpdateOne
+
+    updated = 0
+    ops = []
+    for doc in collection.find({'search_tokens': {'$exists': False}}, {'name': 1, 'category': 1, 'tags': 1}):
+        ops.append(UpdateOne({'_id': doc['_id']}, {'$set': {'search_tokens': product_search_tokens(doc)}}))
+        if len(ops) >= batch_size:
+            updated += collection.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += collection.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+
 @dataclass
 class Product:
     """Product document model for MongoDB"""
@@ -53,6 +94,7 @@ class Product:
             'sales_count': self.sales_count,
             'average_rating': self.average_rating,
             'review_count': self.review_count,
+            'search_tokens': normalize_search_tokens(self.name, self.category, *self.tags),
             'created_at': self.created_at,
             'updated_at': self.updated_at,
         }
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+
+
+@dataclass(frozen=True)
+class CachedPayload:
+    payload: dict[str, Any]
+    etag: str  # unquoted; Response.set_etag() adds the quotes
+    expires_at: float
+
+
+def payload_etag(payload: dict[str, Any]) -> str:
+    """Strong validator for a JSON payload: same content, same ETag, in every worker."""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+class PayloadCache:
+    """In-process TTL cache for assembled JSON payloads of read-mostly endpoints.
+
+    - ``get_or_build`` coalesces concurrent misses: one caller per key runs the
+      rebuild while the others wait on that key's lock and reuse its result.
+    - ``invalidate`` is called by write paths. It bumps a generation counter, so a
+      rebuild that started before the write still answers its own caller but is
+      not stored.
+    - Each entry carries an ETag so routes can answer ``If-None-Match`` with 304.
+
+    Invalidation is per process; with several web workers the TTL bounds how long
+    another worker can serve a payload from before a write.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0, max_entries: int = 32):
+        self._ttl = ttl_seconds
+        self._max_entries = max(1, max_entries)
+        self._entries: OrderedDict[Hashable, CachedPayload] = OrderedDict()
+        self._build_locks: dict[Hashable, threading.Lock] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._coalesced = 0
+        self._rebuilds = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl > 0
+
+    def _fresh(self, key: Hashable) -> CachedPayload | None:
+        # Caller holds self._lock
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            return entry
+        return None
+
+    def get_or_build(self, key: Hashable, build: Callable[[], dict[str, Any]]) -> CachedPayload:
+        if not self.enabled:
+            payload = build()
+            return CachedPayload(payload, payload_etag(payload), 0.0)
+
+        with self._lock:
+            entry = self._fresh(key)
+            if entry is not None:
+                self._hits += 1
+                return entry
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            with self._lock:
+                # Another caller may have rebuilt it while we waited
+                entry = self._fresh(key)
+                if entry is not None:
+                    self._coalesced += 1
+                    return entry
+                generation = self._generation
+
+            payload = build()
+            entry = CachedPayload(payload, payload_etag(payload), time.monotonic() + self._ttl)
+
+            with self._lock:
+                self._rebuilds += 1
+                if generation == self._generation:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self._max_entries:
+                        evicted, _ = self._entries.popitem(last=False)
+                        self._build_locks.pop(evicted, None)
+            return entry
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._invalidations += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "ttl_seconds": self._ttl,
+                "hits": self._hits,
+                "coalesced": self._coalesced,
+                "rebuilds": self._rebuilds,
+                "invalidations": self._invalidations,
+            }
@@ -8,13 +8,18 @@ from datetime import datetime, timezone
 from flask import Blueprint, jsonify, request
 from bson import ObjectId
 
+from config import get_settings
 from models.forum import ForumPost, FORUM_CATEGORIES
+from payload_cache import PayloadCache
 from routes.auth import require_auth, require_admin, get_current_user
 from utils.validators import validate_required_fields
 from utils.cloudinary_helper import upload_image, upload_multiple_images
 
 forum_bp = Blueprint('forum', __name__, url_prefix='/api/forum')
 
+# Published post counts per category; dropped when posts are created, edited, deleted or (un)published
+categories_cache = PayloadCache(ttl_seconds=get_settings().category_cache_ttl_seconds, max_entries=1)
+
 
 def _get_forum_collection():
     """Get MongoDB forum collection"""
@@ -28,6 +33,11 @@ def _get_users_collection():
     return current_app.config.get('db_users')
 
 
+def invalidate_forum_caches():
+    """Drop cached forum payloads after a post write"""
+    categories_cache.invalidate()
+
+
 # ==================== PUBLIC ROUTES ====================
 
 @forum_bp.route('/posts', methods=['GET'])
@@ -214,22 +224,26 @@ def get_categories():
                 'categories': FORUM_CATEGORIES
             })
         
-        # Get post count per category
-        categories_with_count = []
-        for cat in FORUM_CATEGORIES:
-            count = forum_collection.count_documents({
-                'category': cat['id'],
-                'is_published': True
-            })
-            categories_with_count.append({
-                **cat,
-                'post_count': count
-            })
+        def build_categories():
+            # One $group over published posts instead of a count_documents() per category
+            pipeline = [
+                {'$match': {'is_published': True}},
+                {'$group': {'_id': '$category', 'count': {'$sum': 1}}},
+            ]
+            counts = {group['_id']: group['count'] for group in forum_collection.aggregate(pipeline)}
+            return {
+                'ok': True,
+                'categories': [
+                    {**cat, 'post_count': counts.get(cat['id'], 0)}
+                    for cat in FORUM_CATEGORIES
+                ]
+            }
         
-        return jsonify({
-            'ok': True,
-            'categories': categories_with_count
-        })
+        cached = categories_cache.get_or_build('categories', build_categories)
+        response = jsonify(cached.payload)
+        response.set_etag(cached.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -376,6 +390,7 @@ def create_post():
         
         result = forum_collection.insert_one(post.to_dict())
         post._id = str(result.inserted_id)
+        invalidate_forum_caches()
         
         return jsonify({
             'ok': True,
@@ -454,6 +469,7 @@ def update_post(post_id: str):
             {'_id': ObjectId(post_id)},
             {'$set': update_data}
         )
+        invalidate_forum_caches()
         
         # Get updated post
         updated_doc = forum_collection.find_one({'_id': ObjectId(post_id)})
@@ -484,6 +500,7 @@ def delete_post(post_id: str):
         
         # Hard delete
         forum_collection.delete_one({'_id': ObjectId(post_id)})
+        invalidate_forum_caches()
         
         return jsonify({
             'ok': True,
@@ -521,6 +538,7 @@ def toggle_publish(post_id: str):
             {'_id': ObjectId(post_id)},
             {'$set': update_data}
         )
+        invalidate_forum_caches()
         
         return jsonify({
             'ok': True,
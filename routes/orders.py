@@ -11,6 +11,7 @@ from bson import ObjectId
 from models.order import Order, OrderItem, OrderStatus
 from models.product import Product
 from routes.auth import require_auth, require_admin, get_current_user
+from routes.products import invalidate_product_caches
 from utils.validators import validate_required_fields
 from utils.email_service import get_email_service
 from utils.pdf_generator import generate_order_receipt_pdf, is_pdf_generation_available
@@ -153,6 +154,7 @@ def checkout():
                     '$set': {'updated_at': datetime.now(timezone.utc)}
                 }
             )
+        invalidate_product_caches()
         
         # Send order confirmation email with PDF receipt
         try:
@@ -383,6 +385,7 @@ def cancel_order(order_id: str):
                     }
                 }
             )
+        invalidate_product_caches()
         
         # Update order status
         orders_collection.update_one(
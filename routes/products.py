@@ -4,11 +4,15 @@ Handles CRUD operations for marketplace products
 """
 
 from __future__ import annotations
+import re
 from datetime import datetime, timezone
 from flask import Blueprint, jsonify, request
 from bson import ObjectId
+from pymongo.errors import OperationFailure
 
-from models.product import Product
+from config import get_settings
+from models.product import Product, SEARCH_TOKEN_FIELDS, normalize_search_tokens, product_search_tokens
+from payload_cache import PayloadCache
 from routes.auth import require_auth, require_admin, get_current_user
 from utils.validators import validate_required_fields, validate_positive_number
 from utils.cloudinary_helper import upload_image, upload_multiple_images, delete_image
@@ -19,6 +23,10 @@ products_bp = Blueprint('products', __name__, url_prefix='/api/products')
 # Initialize email service
 email_service = EmailService()
 
+# Assembled /featured and /categories payloads; dropped on every product write
+featured_cache = PayloadCache(ttl_seconds=get_settings().featured_cache_ttl_seconds)
+categories_cache = PayloadCache(ttl_seconds=get_settings().category_cache_ttl_seconds, max_entries=1)
+
 
 def _get_products_collection():
     """Get MongoDB products collection"""
@@ -38,6 +46,12 @@ def _get_reviews_collection():
     return current_app.config.get('db_reviews')
 
 
+def invalidate_product_caches():
+    """Drop cached product payloads after a write (create/update/delete, stock, ratings)"""
+    featured_cache.invalidate()
+    categories_cache.invalidate()
+
+
 def _send_product_notification_email(user_doc: dict, product_name: str, action: str, reason: str = None, changes: list = None):
     """Send email notification to product owner about product changes"""
     user_email = user_doc.get('email')
@@ -129,6 +143,59 @@ Bignay Marketplace
     )
 
 
+def _latest_review_dict(review: dict) -> dict:
+    """Public shape of a product's latest review, as embedded in product listings"""
+    return {
+        'rating': review.get('rating', 0),
+        'comment': review.get('comment', ''),
+        'comment_filtered': review.get('comment_filtered', review.get('comment', '')),
+        'user_name': review.get('user_name', 'Anonymous'),
+        'created_at': review.get('created_at').isoformat() if review.get('created_at') else None
+    }
+
+
+def _latest_reviews_by_product(reviews_collection, product_ids: list[str]) -> dict[str, dict]:
+    """Latest active review for each product id, fetched in a single aggregation.
+
+    Replaces one find_one() per product; served by the
+    (product_id, is_active, created_at) index on reviews.
+    """
+    if reviews_collection is None or not product_ids:
+        return {}
+    pipeline = [
+        {'$match': {'product_id': {'$in': product_ids}, 'is_active': True}},
+        {'$sort': {'product_id': 1, 'created_at': -1}},
+        {'$project': {
+            'product_id': 1, 'rating': 1, 'comment': 1, 'comment_filtered': 1,
+            'user_name': 1, 'created_at': 1,
+        }},
+        {'$group': {'_id': '$product_id', 'review': {'$first': '$$ROOT'}}},
+    ]
+    return {group['_id']: group['review'] for group in reviews_collection.aggregate(pipeline)}
+
+
+def _regex_search_clauses(search: str) -> list[dict]:
+    """Unanchored case-insensitive match; a collection scan, so only used as a fallback"""
+    pattern = re.escape(search)
+    return [
+        {'name': {'$regex': pattern, '$options': 'i'}},
+        {'description': {'$regex': pattern, '$options': 'i'}},
+        {'tags': {'$regex': pattern, '$options': 'i'}},
+    ]
+
+
+def _prefix_search_query(search: str) -> dict | None:
+    """Every search word must prefix a search_tokens entry.
+
+    Anchored, case-sensitive regexes on normalized tokens use the search_tokens index
+    as a range scan, so autocomplete stays fast as the catalogue grows.
+    """
+    tokens = normalize_search_tokens(search)
+    if not tokens:
+        return None
+    return {'$and': [{'search_tokens': {'$regex': f'^{re.escape(t)}'}} for t in tokens]}
+
+
 # Public routes
 
 @products_bp.route('/', methods=['GET'])
@@ -159,13 +226,6 @@ def list_products():
         if category:
             query['category'] = category
         
-        if search:
-            query['$or'] = [
-                {'name': {'$regex': search, '$options': 'i'}},
-                {'description': {'$regex': search, '$options': 'i'}},
-                {'tags': {'$regex': search, '$options': 'i'}},
-            ]
-        
         if min_price is not None:
             query['price'] = {'$gte': min_price}
         
@@ -190,38 +250,64 @@ def list_products():
             sort_field = 'views'
         
         sort_direction = -1 if sort_order == 'desc' else 1
+        sort_spec = [(sort_field, sort_direction)]
         
-        # Get products
-        cursor = products_collection.find(query).skip(skip).limit(limit).sort(sort_field, sort_direction)
-        total = products_collection.count_documents(query)
-        
-        # Get reviews collection to fetch latest review for each product
-        reviews_collection = _get_reviews_collection()
+        # Search: $text (indexed, stemmed) by default, prefix tokens for autocomplete,
+        # regex only when asked for or when $text is unavailable
+        search_mode = request.args.get('search_mode', 'text')
+        projection = None
+        search_query = {}
+        if search:
+            if search_mode == 'prefix':
+                search_query = _prefix_search_query(search) or {}
+            elif search_mode == 'regex':
+                search_query = {'$or': _regex_search_clauses(search)}
+            else:
+                search_mode = 'text'
+                search_query = {'$text': {'$search': search}}
+                if sort_by == 'relevance':
+                    projection = {'score': {'$meta': 'textScore'}}
+                    sort_spec = [('score', {'$meta': 'textScore'}), ('created_at', -1)]
+        
+        def run_query(extra: dict, sort, proj):
+            full_query = {**query, **extra}
+            cursor = products_collection.find(full_query, proj).sort(sort).skip(skip).limit(limit)
+            return list(cursor), products_collection.count_documents(full_query)
+        
+        try:
+            docs, total = run_query(search_query, sort_spec, projection)
+        except OperationFailure:
+            if search_mode != 'text':
+                raise
+            # No text index on this deployment - fall back to the regex scan
+            search_mode = 'regex'
+            docs, total = run_query({'$or': _regex_search_clauses(search)}, [(sort_field, sort_direction)], None)
+        
+        if search_mode == 'text' and total == 0:
+            # $text matches whole (stemmed) words; retry as a prefix match so partial words still hit
+            prefix_query = _prefix_search_query(search)
+            if prefix_query:
+                search_mode = 'prefix'
+                docs, total = run_query(prefix_query, [(sort_field, sort_direction)], None)
+        
+        # Latest review for every product on the page in one round-trip
+        latest_reviews = _latest_reviews_by_product(
+            _get_reviews_collection(), [str(doc['_id']) for doc in docs]
+        )
         
         products = []
-        for doc in cursor:
+        for doc in docs:
             product = Product.from_dict(doc)
             product._id = str(doc['_id'])
             product_dict = product.to_public_dict()
             
-            # Fetch the latest review for this product
-            if reviews_collection is not None:
-                latest_review = reviews_collection.find_one(
-                    {'product_id': str(doc['_id']), 'is_active': True},
-                    sort=[('created_at', -1)]
-                )
-                if latest_review:
-                    product_dict['latest_review'] = {
-                        'rating': latest_review.get('rating', 0),
-                        'comment': latest_review.get('comment', ''),
-                        'comment_filtered': latest_review.get('comment_filtered', latest_review.get('comment', '')),
-                        'user_name': latest_review.get('user_name', 'Anonymous'),
-                        'created_at': latest_review.get('created_at').isoformat() if latest_review.get('created_at') else None
-                    }
+            latest_review = latest_reviews.get(str(doc['_id']))
+            if latest_review:
+                product_dict['latest_review'] = _latest_review_dict(latest_review)
             
             products.append(product_dict)
         
-        return jsonify({
+        response = {
             'ok': True,
             'products': products,
             'pagination': {
@@ -230,7 +316,10 @@ def list_products():
                 'total': total,
                 'pages': (total + limit - 1) // limit
             }
-        })
+        }
+        if search:
+            response['search_mode'] = search_mode
+        return jsonify(response)
     
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -244,27 +333,7 @@ def get_featured_products():
         if products_collection is None:
             return jsonify({'ok': False, 'error': 'Database not available'}), 503
         
-        limit = int(request.args.get('limit', 10))
-        
-        # Recently added
-        recent = list(products_collection.find(
-            {'is_active': True, 'stock': {'$gt': 0}}
-        ).sort('created_at', -1).limit(limit))
-        
-        # Most popular (by sales)
-        popular = list(products_collection.find(
-            {'is_active': True, 'stock': {'$gt': 0}}
-        ).sort('sales_count', -1).limit(limit))
-        
-        # Highest rated
-        top_rated = list(products_collection.find(
-            {'is_active': True, 'stock': {'$gt': 0}, 'review_count': {'$gt': 0}}
-        ).sort('average_rating', -1).limit(limit))
-        
-        # Most viewed
-        trending = list(products_collection.find(
-            {'is_active': True, 'stock': {'$gt': 0}}
-        ).sort('views', -1).limit(limit))
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)  # Cap: the cache is keyed by limit
         
         def convert_products(docs):
             products = []
@@ -274,15 +343,43 @@ def get_featured_products():
                 products.append(product.to_public_dict())
             return products
         
-        return jsonify({
-            'ok': True,
-            'featured': {
-                'recently_added': convert_products(recent),
-                'most_popular': convert_products(popular),
-                'top_rated': convert_products(top_rated),
-                'trending': convert_products(trending),
+        def build_featured():
+            # Recently added
+            recent = list(products_collection.find(
+                {'is_active': True, 'stock': {'$gt': 0}}
+            ).sort('created_at', -1).limit(limit))
+            
+            # Most popular (by sales)
+            popular = list(products_collection.find(
+                {'is_active': True, 'stock': {'$gt': 0}}
+            ).sort('sales_count', -1).limit(limit))
+            
+            # Highest rated
+            top_rated = list(products_collection.find(
+                {'is_active': True, 'stock': {'$gt': 0}, 'review_count': {'$gt': 0}}
+            ).sort('average_rating', -1).limit(limit))
+            
+            # Most viewed
+            trending = list(products_collection.find(
+                {'is_active': True, 'stock': {'$gt': 0}}
+            ).sort('views', -1).limit(limit))
+            
+            return {
+                'ok': True,
+                'featured': {
+                    'recently_added': convert_products(recent),
+                    'most_popular': convert_products(popular),
+                    'top_rated': convert_products(top_rated),
+                    'trending': convert_products(trending),
+                }
             }
-        })
+        
+        # Concurrent misses share one rebuild; If-None-Match on the ETag gets a bodiless 304
+        cached = featured_cache.get_or_build(('featured', limit), build_featured)
+        response = jsonify(cached.payload)
+        response.set_etag(cached.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -296,19 +393,26 @@ def get_categories():
         if products_collection is None:
             return jsonify({'ok': False, 'error': 'Database not available'}), 503
         
-        # Get distinct categories
-        categories = products_collection.distinct('category', {'is_active': True})
-        
-        # Get count for each category
-        category_counts = []
-        for cat in categories:
-            count = products_collection.count_documents({'category': cat, 'is_active': True})
-            category_counts.append({'name': cat, 'count': count})
+        def build_categories():
+            # One $group instead of distinct() + a count_documents() per category
+            pipeline = [
+                {'$match': {'is_active': True, 'category': {'$ne': None}}},
+                {'$group': {'_id': '$category', 'count': {'$sum': 1}}},
+                {'$sort': {'_id': 1}},
+            ]
+            return {
+                'ok': True,
+                'categories': [
+                    {'name': group['_id'], 'count': group['count']}
+                    for group in products_collection.aggregate(pipeline)
+                ]
+            }
         
-        return jsonify({
-            'ok': True,
-            'categories': category_counts
-        })
+        cached = categories_cache.get_or_build('categories', build_categories)
+        response = jsonify(cached.payload)
+        response.set_etag(cached.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
@@ -432,6 +536,7 @@ def create_product():
         
         result = products_collection.insert_one(product.to_dict())
         product._id = str(result.inserted_id)
+        invalidate_product_caches()
         
         return jsonify({
             'ok': True,
@@ -563,10 +668,14 @@ def update_product(product_id: str):
                 else:
                     changes.append(f"{field.replace('_', ' ').title()} updated")
         
+        if SEARCH_TOKEN_FIELDS & update_fields.keys():
+            update_fields['search_tokens'] = product_search_tokens({**product_doc, **update_fields})
+        
         products_collection.update_one(
             {'_id': ObjectId(product_id)},
             {'$set': update_fields}
         )
+        invalidate_product_caches()
         
         # Send email notification to product owner if product has a seller
         seller_id = product_doc.get('seller_id')
@@ -636,6 +745,7 @@ def delete_product(product_id: str):
                 'updated_at': datetime.now(timezone.utc)
             }}
         )
+        invalidate_product_caches()
         
         return jsonify({
             'ok': True,
@@ -671,6 +781,7 @@ def restore_product(product_id: str):
                 'updated_at': datetime.now(timezone.utc)
             }}
         )
+        invalidate_product_caches()
         
         return jsonify({
             'ok': True,
@@ -716,6 +827,7 @@ def add_product_images(product_id: str):
                 }
             }
         )
+        invalidate_product_caches()
         
         return jsonify({
             'ok': True,
@@ -756,6 +868,7 @@ def remove_product_image(product_id: str, image_index: int):
                 }
             }
         )
+        invalidate_product_caches()
         
         return jsonify({
             'ok': True,
@@ -907,6 +1020,7 @@ def user_create_product():
         
         result = products_collection.insert_one(product.to_dict())
         product._id = str(result.inserted_id)
+        invalidate_product_caches()
         
         return jsonify({
             'ok': True,
@@ -1020,10 +1134,14 @@ def user_update_product(product_id: str):
         
         update_fields['updated_at'] = datetime.now(timezone.utc)
         
+        if SEARCH_TOKEN_FIELDS & update_fields.keys():
+            update_fields['search_tokens'] = product_search_tokens({**product_doc, **update_fields})
+        
         products_collection.update_one(
             {'_id': ObjectId(product_id)},
             {'$set': update_fields}
         )
+        invalidate_product_caches()
         
         # Get updated product
         updated_doc = products_collection.find_one({'_id': ObjectId(product_id)})
@@ -1065,6 +1183,7 @@ def user_delete_product(product_id: str):
                 'updated_at': datetime.now(timezone.utc)
             }}
         )
+        invalidate_product_caches()
         
         return jsonify({
             'ok': True,
@@ -1104,6 +1223,7 @@ def user_restore_product(product_id: str):
                 'updated_at': datetime.now(timezone.utc)
             }}
         )
+        invalidate_product_caches()
         
         return jsonify({
             'ok': True,
@@ -11,6 +11,7 @@ from bson import ObjectId
 from models.review import Review
 from routes.auth import require_auth, require_admin, get_current_user
 from routes.orders import user_purchased_product
+from routes.products import invalidate_product_caches
 from utils.validators import validate_rating
 from utils.bad_words_filter import filter_bad_words, validate_content
 
@@ -76,6 +77,8 @@ def _update_product_rating(product_id: str):
             'updated_at': datetime.now(timezone.utc)
         }}
     )
+    # top_rated in /products/featured depends on these
+    invalidate_product_caches()
 
 
 @reviews_bp.route('/product/<product_id>', methods=['GET'])
@@ -0,0 +1,52 @@
+"""The masked cv2 statistics in utils_image must match the pre-change boolean-index code."""
+
+from __future__ import annotations
+
+import cv2
+import numpy as np
+import pytest
+
+from benchmark import _legacy_color_and_size, _legacy_contour_mask, _legacy_mold_ratio, _mask_fixtures
+from utils_image import MOLD_RATIO_THRESHOLD, _color_and_size, _largest_contour_mask, _mold_ratio
+
+FIXTURES = _mask_fixtures(0.3)
+
+
+@pytest.fixture(params=FIXTURES, ids=[name for name, _ in FIXTURES])
+def frame(request):
+    image = request.param[1]
+    return image, cv2.cvtColor(image, cv2.COLOR_BGR2HSV), cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+
+
+def test_contour_mask_matches_legacy(frame):
+    image, hsv, _ = frame
+    mask, coverage = _largest_contour_mask(image, hsv)
+    legacy_mask, legacy_coverage = _legacy_contour_mask(image)
+    assert np.array_equal(mask, legacy_mask)
+    assert coverage == legacy_coverage
+
+
+def test_color_and_size_match_legacy(frame):
+    image, hsv, lab = frame
+    mask, coverage = _largest_contour_mask(image, hsv)
+    hsv_mean, lab_mean, size = _color_and_size(hsv, lab, mask, coverage)
+    legacy_hsv, legacy_lab, legacy_size = _legacy_color_and_size(hsv, lab, mask, coverage)
+    assert hsv_mean == pytest.approx(legacy_hsv, abs=1e-9)
+    assert lab_mean == pytest.approx(legacy_lab, abs=1e-9)
+    if legacy_size is None:
+        assert size is None
+    else:
+        assert size == pytest.approx(legacy_size, abs=1e-9)
+
+
+def test_mold_ratio_matches_legacy(frame):
+    _, hsv, _ = frame
+    # Whole-frame ratio, same as before: MOLD_RATIO_THRESHOLD was tuned on exactly this value
+    assert _mold_ratio(hsv) == _legacy_mold_ratio(hsv)
+
+
+def test_mold_ratio_thresholds():
+    black = cv2.cvtColor(np.zeros((40, 40, 3), dtype=np.uint8), cv2.COLOR_BGR2HSV)
+    grey = cv2.cvtColor(np.full((40, 40, 3), 128, dtype=np.uint8), cv2.COLOR_BGR2HSV)
+    assert _mold_ratio(black) == 1.0 > MOLD_RATIO_THRESHOLD
+    assert _mold_ratio(grey) == 0.0
@@ -0,0 +1,124 @@
+"""GET /api/products ?search= in its text, prefix and regex modes, and the products text index."""
+
+from __future__ import annotations
+
+import re
+
+import mongomock
+import pytest
+from flask import Flask
+from pymongo.errors import OperationFailure
+
+from db_indexes import INDEXES, _text_fields, ensure_indexes
+from models.product import Product
+from routes.products import products_bp
+
+TEXT_FIELDS = sorted(next(_text_fields(spec.keys) for spec in INDEXES["products"] if _text_fields(spec.keys)))
+
+
+class TextSearchCollection:
+    """mongomock has no $text: answer it with whole-word matches over the text-indexed
+    fields, or fail the way a server without a text index does."""
+
+    def __init__(self, collection, text_index: bool = True):
+        self._collection = collection
+        self._text_index = text_index
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def _translate(self, query: dict) -> dict:
+        if "$text" not in query:
+            return query
+        if not self._text_index:
+            raise OperationFailure("text index required for $text query")
+        words = query["$text"]["$search"].lower().split()
+        rest = {key: value for key, value in query.items() if key != "$text"}
+        matches = [
+            {field: {"$regex": rf"\b{re.escape(word)}\b", "$options": "i"}} for field in TEXT_FIELDS for word in words
+        ]
+        return {"$and": [rest, {"$or": matches}]}
+
+    def find(self, query, *args, **kwargs):
+        return self._collection.find(self._translate(query), *args, **kwargs)
+
+    def count_documents(self, query, *args, **kwargs):
+        return self._collection.count_documents(self._translate(query), *args, **kwargs)
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient().bignay
+    for name, tags in [
+        ("Bignay Jam (Café)", ["preserves", "sweet"]),
+        ("Fresh Bignay Fruit", ["fresh"]),
+        ("Strawberry Wine", ["wine"]),
+    ]:
+        product = Product(
+            name=name,
+            description="Made in Batangas",
+            price=120,
+            stock=5,
+            category="Food",
+            seller_id="seller",
+            seller_name="Seller",
+            tags=tags,
+        )
+        db.products.insert_one(product.to_dict())
+    return db
+
+
+def _search(db, text_index: bool = True, **params) -> dict:
+    app = Flask(__name__)
+    app.register_blueprint(products_bp)
+    app.config["db_products"] = TextSearchCollection(db.products, text_index)
+    app.config["db_reviews"] = db.reviews
+    response = app.test_client().get("/api/products/", query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def _names(payload: dict) -> list[str]:
+    return sorted(product["name"] for product in payload["products"])
+
+
+def test_text_search_covers_tags(db):
+    payload = _search(db, search="preserves")
+    assert payload["search_mode"] == "text"
+    assert _names(payload) == ["Bignay Jam (Café)"]
+
+
+def test_text_miss_retries_as_prefix(db):
+    payload = _search(db, search="straw")
+    assert payload["search_mode"] == "prefix"
+    assert _names(payload) == ["Strawberry Wine"]
+
+
+def test_missing_text_index_falls_back_to_regex(db):
+    payload = _search(db, text_index=False, search="jam")
+    assert payload["search_mode"] == "regex"
+    assert _names(payload) == ["Bignay Jam (Café)"]
+
+
+def test_prefix_mode_matches_every_word(db):
+    payload = _search(db, search="bign caf", search_mode="prefix")
+    assert payload["search_mode"] == "prefix"
+    assert _names(payload) == ["Bignay Jam (Café)"]
+
+
+def test_regex_mode_matches_tags(db):
+    payload = _search(db, search="wine", search_mode="regex")
+    assert payload["search_mode"] == "regex"
+    assert _names(payload) == ["Strawberry Wine"]
+
+
+def test_ensure_indexes_rebuilds_outdated_text_index(db):
+    old = db.products.create_index([("name", "text"), ("description", "text")])
+    result = ensure_indexes(db)
+    assert result["replaced"] == [f"products.{old}"]
+    assert not result["conflicts"]
+    text_indexes = [
+        _text_fields(index["key"]) for index in db.products.index_information().values() if _text_fields(index["key"])
+    ]
+    assert text_indexes == [set(TEXT_FIELDS)]
+    assert ensure_indexes(db)["replaced"] == []
@@ -19,13 +19,19 @@ Usage:
     python train_model.py --subject leaf
     python train_model.py --subject both
     python train_model.py --subject fruit --fine-tune  # Enable fine-tuning phase
+    python train_model.py --subject both --tflite-only  # Re-export TFLite from saved models
+    python train_model.py --subject both --calibrate-only  # Re-fit confidence calibration
 
 Output:
     - backend/model/fruit_model.h5
     - backend/model/leaf_model.h5
+    - backend/model/{fruit,leaf}_model_fp16.tflite
+    - backend/model/{fruit,leaf}_model_int8.tflite
+    - backend/model/{fruit,leaf}_model_calibration.json
 """
 
 import argparse
+import json
 import os
 import random
 from datetime import datetime
@@ -59,6 +65,9 @@ LABEL_SMOOTHING = 0.1  # Helps generalization
 VALIDATION_SPLIT = 0.2
 FINE_TUNE_EPOCHS = 50
 FINE_TUNE_AT_LAYER = 100  # Unfreeze layers after this index
+TFLITE_CALIBRATION_SAMPLES = 200  # Images sampled for int8 calibration
+TEMPERATURE_RANGE = (0.05, 20.0)  # Search bounds for confidence calibration
+ECE_BINS = 15
 
 # Class definitions (must match backend/app.py)
 FRUIT_CLASSES = ["good", "mold", "overripe", "ripe", "unripe"]
@@ -201,9 +210,10 @@ def create_dataset(data_dir: Path, classes: list[str], is_training: bool = True,
     file_paths = unique_paths
     labels = unique_labels
     
-    # Shuffle and split
-    combined = list(zip(file_paths, labels))
-    random.shuffle(combined)
+    # Shuffle and split with a local RNG over a sorted file list, so every call
+    # (training, calibration, TFLite export) sees the same train/validation split
+    combined = sorted(zip(file_paths, labels))
+    random.Random(SEED).shuffle(combined)
     
     split_idx = int(len(combined) * (1 - validation_split))
     train_data = combined[:split_idx]
@@ -449,6 +459,236 @@ def create_callbacks(model_path: Path, log_dir: Path, monitor='val_accuracy'):
     return callback_list
 
 
+def _representative_dataset(train_ds):
+    """
+    Yields preprocessed single images from the training split for int8 calibration.
+    Uses the training preprocessing so activation ranges match what the model was fit on.
+    """
+    samples = train_ds.unbatch().take(TFLITE_CALIBRATION_SAMPLES)
+
+    def generator():
+        for img, _ in samples:
+            yield [tf.expand_dims(tf.cast(img, tf.float32), 0)]
+
+    return generator
+
+
+def _tflite_accuracy(tflite_model: bytes, val_ds) -> float:
+    """Top-1 accuracy of a TFLite flatbuffer on the validation split."""
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    input_index = interpreter.get_input_details()[0]["index"]
+    output_index = interpreter.get_output_details()[0]["index"]
+
+    correct = 0
+    total = 0
+    for images, labels in val_ds:
+        batch = images.numpy().astype(np.float32)
+        interpreter.resize_tensor_input(input_index, list(batch.shape))
+        interpreter.allocate_tensors()
+        interpreter.set_tensor(input_index, batch)
+        interpreter.invoke()
+        preds = interpreter.get_tensor(output_index)
+        correct += int(np.sum(np.argmax(preds, axis=1) == np.argmax(labels.numpy(), axis=1)))
+        total += batch.shape[0]
+    return correct / total if total else 0.0
+
+
+def export_tflite(model, model_path: Path, train_ds, val_ds) -> dict:
+    """
+    Exports float16 and int8-quantized TFLite versions of a trained model next to model_path
+    and reports their validation accuracy against the Keras model.
+
+    The int8 export quantizes weights and, using the representative dataset, activations;
+    ops without an int8 kernel fall back to float so the model always converts.
+    train_ds/val_ds must be the split the model was trained on, so the reported
+    accuracy deltas never include training images.
+    """
+    print("\n" + "="*50)
+    print("TFLite Export")
+    print("="*50)
+
+    keras_accuracy = None
+    correct = 0
+    total = 0
+    for images, labels in val_ds:
+        preds = model(images, training=False).numpy()
+        correct += int(np.sum(np.argmax(preds, axis=1) == np.argmax(labels.numpy(), axis=1)))
+        total += int(images.shape[0])
+    if total:
+        keras_accuracy = correct / total
+        print(f"Keras validation accuracy: {keras_accuracy:.2%}")
+
+    variants = {}
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    variants["fp16"] = converter
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = _representative_dataset(train_ds)
+    variants["int8"] = converter
+
+    report = {"keras_accuracy": keras_accuracy}
+    for variant, converter in variants.items():
+        out_path = model_path.with_name(f"{model_path.stem}_{variant}.tflite")
+        try:
+            tflite_model = converter.convert()
+        except Exception as e:
+            print(f"Warning: Could not export {variant} TFLite model: {e}")
+            continue
+        out_path.write_bytes(tflite_model)
+        size_mb = len(tflite_model) / (1024 * 1024)
+        print(f"✓ {variant} TFLite saved to: {out_path} ({size_mb:.2f} MB)")
+
+        if keras_accuracy is not None:
+            accuracy = _tflite_accuracy(tflite_model, val_ds)
+            delta = accuracy - keras_accuracy
+            print(f"  {variant} validation accuracy: {accuracy:.2%} (delta vs Keras: {delta:+.2%})")
+            report[variant] = {"path": str(out_path), "size_mb": size_mb, "accuracy": accuracy, "delta": delta}
+        else:
+            report[variant] = {"path": str(out_path), "size_mb": size_mb}
+
+    return report
+
+
+def _scaled_log_probs(log_probs: np.ndarray, temperature: float) -> np.ndarray:
+    scaled = log_probs / temperature
+    scaled -= scaled.max(axis=1, keepdims=True)
+    return scaled - np.log(np.exp(scaled).sum(axis=1, keepdims=True))
+
+
+def _expected_calibration_error(probs: np.ndarray, labels: np.ndarray) -> float:
+    confidences = probs.max(axis=1)
+    correct = (probs.argmax(axis=1) == labels).astype(np.float64)
+    bins = np.minimum((confidences * ECE_BINS).astype(int), ECE_BINS - 1)
+    ece = 0.0
+    for b in range(ECE_BINS):
+        in_bin = bins == b
+        if in_bin.any():
+            ece += in_bin.mean() * abs(correct[in_bin].mean() - confidences[in_bin].mean())
+    return float(ece)
+
+
+def fit_temperature(model, val_ds) -> dict | None:
+    """
+    Fits a single softmax temperature on the validation split by minimising negative
+    log-likelihood (temperature scaling). Label smoothing during training leaves the
+    model under-confident, so raw softmax scores don't line up with the detection
+    thresholds in app.py; T rescales them without changing any argmax.
+    """
+    probs, labels = [], []
+    for images, one_hot in val_ds:
+        probs.append(model(images, training=False).numpy().astype(np.float64))
+        labels.append(np.argmax(one_hot.numpy(), axis=1))
+    if not probs:
+        return None
+    probs = np.concatenate(probs)
+    labels = np.concatenate(labels)
+    log_probs = np.log(np.clip(probs, 1e-12, None))
+    rows = np.arange(len(labels))
+
+    def nll(log_t: float) -> float:
+        return float(-_scaled_log_probs(log_probs, np.exp(log_t))[rows, labels].mean())
+
+    # NLL is unimodal in log(T); golden-section search needs no extra dependency
+    lo, hi = np.log(TEMPERATURE_RANGE[0]), np.log(TEMPERATURE_RANGE[1])
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+    for _ in range(60):
+        if nll(a) < nll(b):
+            hi, b = b, a
+            a = hi - ratio * (hi - lo)
+        else:
+            lo, a = a, b
+            b = lo + ratio * (hi - lo)
+    temperature = float(np.exp((lo + hi) / 2))
+
+    calibrated = np.exp(_scaled_log_probs(log_probs, temperature))
+    return {
+        "temperature": temperature,
+        "validation_samples": int(len(labels)),
+        "nll_before": nll(0.0),
+        "nll_after": nll(np.log(temperature)),
+        "ece_before": _expected_calibration_error(probs, labels),
+        "ece_after": _expected_calibration_error(calibrated, labels),
+    }
+
+
+def calibrate_model(model, model_path: Path, val_ds, classes: list[str]) -> dict | None:
+    """Fits temperature scaling and writes <model>_calibration.json, loaded by inference.py."""
+    print("\n" + "="*50)
+    print("Confidence Calibration")
+    print("="*50)
+
+    report = fit_temperature(model, val_ds)
+    if report is None:
+        print("Warning: No validation samples - skipping calibration")
+        return None
+
+    report["classes"] = classes
+    report["fitted_at"] = datetime.now().isoformat()
+    out_path = model_path.with_name(f"{model_path.stem}_calibration.json")
+    out_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"✓ Calibration saved to: {out_path}")
+    print(f"  Temperature: {report['temperature']:.3f}")
+    print(f"  NLL: {report['nll_before']:.4f} -> {report['nll_after']:.4f}")
+    print(f"  ECE: {report['ece_before']:.2%} -> {report['ece_after']:.2%}")
+    return report
+
+
+def calibrate_from_saved(subject: str) -> bool:
+    """Loads the saved model for subject and re-fits its calibration without retraining."""
+    if subject == "fruit":
+        data_dir = DATASET_DIR / "fruit"
+        classes = FRUIT_CLASSES
+        model_path = MODEL_DIR / "fruit_model.h5"
+    else:
+        data_dir = DATASET_DIR / "leaf"
+        classes = LEAF_CLASSES
+        model_path = MODEL_DIR / "leaf_model.h5"
+
+    keras_path = model_path.with_suffix('.keras')
+    source = keras_path if keras_path.exists() else model_path
+    if not source.exists():
+        print(f"ERROR: No saved model found at {source}")
+        return False
+    if not data_dir.exists():
+        print(f"ERROR: Dataset directory not found: {data_dir}")
+        return False
+
+    model = tf.keras.models.load_model(str(source))
+    _, val_ds, _, _, _ = create_dataset(data_dir, classes, validation_split=VALIDATION_SPLIT)
+    return calibrate_model(model, model_path, val_ds, classes) is not None
+
+
+def export_tflite_from_saved(subject: str) -> bool:
+    """Loads the saved model for subject and exports its TFLite variants without retraining."""
+    if subject == "fruit":
+        data_dir = DATASET_DIR / "fruit"
+        classes = FRUIT_CLASSES
+        model_path = MODEL_DIR / "fruit_model.h5"
+    else:
+        data_dir = DATASET_DIR / "leaf"
+        classes = LEAF_CLASSES
+        model_path = MODEL_DIR / "leaf_model.h5"
+
+    keras_path = model_path.with_suffix('.keras')
+    source = keras_path if keras_path.exists() else model_path
+    if not source.exists():
+        print(f"ERROR: No saved model found at {source}")
+        return False
+    if not data_dir.exists():
+        print(f"ERROR: Dataset directory not found: {data_dir}")
+        return False
+
+    model = tf.keras.models.load_model(str(source))
+    train_ds, val_ds, _, _, _ = create_dataset(data_dir, classes, validation_split=VALIDATION_SPLIT)
+    export_tflite(model, model_path, train_ds, val_ds)
+    return True
+
+
 def train_model(subject: str, enable_fine_tuning: bool = True):
     """
     Trains a classification model with improved methodology.
@@ -629,6 +869,12 @@ def train_model(subject: str, enable_fine_tuning: bool = True):
     except Exception as e:
         print(f"Warning: Could not save SavedModel format: {e}")
     
+    # Temperature scaling on the same validation split the model was selected on
+    calibrate_model(model, model_path, val_ds, classes)
+
+    # TFLite (float16 + int8) for the lightweight inference backend
+    export_tflite(model, model_path, train_ds, val_ds)
+    
     # Evaluate final model
     print("\n" + "="*50)
     print("Final Evaluation")
@@ -664,7 +910,29 @@ def main():
         action="store_true",
         help="Disable fine-tuning phase"
     )
+    parser.add_argument(
+        "--tflite-only",
+        action="store_true",
+        help="Skip training; export TFLite models from the saved .keras/.h5 files"
+    )
+    parser.add_argument(
+        "--calibrate-only",
+        action="store_true",
+        help="Skip training; re-fit confidence calibration for the saved .keras/.h5 files"
+    )
     args = parser.parse_args()
+
+    if args.calibrate_only:
+        for subject in ("fruit", "leaf"):
+            if args.subject in [subject, "both"]:
+                calibrate_from_saved(subject)
+        return
+
+    if args.tflite_only:
+        for subject in ("fruit", "leaf"):
+            if args.subject in [subject, "both"]:
+                export_tflite_from_saved(subject)
+        return
     
     enable_fine_tuning = args.fine_tune and not args.no_fine_tune
     
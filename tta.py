@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from utils_image import enhanced_model_input
+
+# Variants a TTAugmenter can generate; "original" is always included
+TTA_VARIANTS = ("original", "hflip", "vflip", "crop", "enhanced")
+TTA_AGGREGATIONS = ("mean", "max", "vote")
+
+
+@dataclass(frozen=True)
+class TTAResult:
+    class_name: str
+    confidence: float
+    probabilities: list[float]  # aggregated, in classifier class order
+    agreement: float  # share of variants whose top-1 class matches class_name
+
+
+class TTAugmenter:
+    """Scores several views of a scan in a single forward pass and combines their softmax rows.
+
+    Every variant is derived from the 224x224 model input (flips) or a cheap crop/resize
+    of the analysis frame, so building N variants costs a few resizes, and the model
+    sees them as one (N, 224, 224, 3) batch rather than N separate calls.
+
+    Aggregations over the (N, num_classes) probabilities:
+      - mean: average the rows (soft voting)
+      - max: keep the single most confident row (the old "original vs enhanced" rule)
+      - vote: majority of top-1 classes, ties broken by mean probability
+    """
+
+    def __init__(
+        self,
+        variants: list[str] | tuple[str, ...],
+        aggregation: str = "mean",
+        crop_fraction: float = 0.8,
+        enhancement_preset: str = "full",
+        working_size: int = 224,
+        size: int = 224,
+    ):
+        unknown = [v for v in variants if v not in TTA_VARIANTS]
+        if unknown:
+            raise ValueError(f"Unknown TTA variants {unknown}; choose from {TTA_VARIANTS}")
+        if aggregation not in TTA_AGGREGATIONS:
+            raise ValueError(f"Unknown TTA aggregation {aggregation!r}; choose from {TTA_AGGREGATIONS}")
+        # "original" first, duplicates dropped, order otherwise as configured
+        self._variants = tuple(dict.fromkeys(["original", *variants]))
+        self._aggregation = aggregation
+        self._crop_fraction = min(1.0, max(0.1, crop_fraction))
+        self._enhancement_preset = enhancement_preset
+        self._working_size = working_size
+        self._size = size
+
+    @property
+    def variants(self) -> tuple[str, ...]:
+        return self._variants
+
+    @property
+    def aggregation(self) -> str:
+        return self._aggregation
+
+    def variants_for(self, enhance: bool = True) -> tuple[str, ...]:
+        """Variants scored for one frame; "enhanced" only when enhancement applies to it."""
+        if enhance:
+            return self._variants
+        return tuple(v for v in self._variants if v != "enhanced")
+
+    def build_batch(self, image_bgr: np.ndarray, enhance: bool = True) -> np.ndarray:
+        """(len(variants_for(enhance)), size, size, 3) float32 model inputs for one frame."""
+        size = self._size
+        original = cv2.resize(image_bgr, (size, size), interpolation=cv2.INTER_AREA)
+        frames = []
+        for variant in self.variants_for(enhance):
+            if variant == "original":
+                frames.append(original)
+            elif variant == "hflip":
+                frames.append(original[:, ::-1])
+            elif variant == "vflip":
+                frames.append(original[::-1])
+            elif variant == "crop":
+                h, w = image_bgr.shape[:2]
+                ch, cw = max(1, int(h * self._crop_fraction)), max(1, int(w * self._crop_fraction))
+                y, x = (h - ch) // 2, (w - cw) // 2
+                frames.append(
+                    cv2.resize(image_bgr[y:y + ch, x:x + cw], (size, size), interpolation=cv2.INTER_AREA)
+                )
+            elif variant == "enhanced":
+                frames.append(
+                    enhanced_model_input(
+                        image_bgr, self._enhancement_preset, self._working_size, size, resized=original
+                    )
+                )
+        return np.stack(frames).astype(np.float32) / 255.0
+
+    def aggregate(self, probs: np.ndarray, classes: list[str]) -> TTAResult:
+        """Combine one frame's (variant count, num_classes) softmax rows."""
+        probs = np.asarray(probs, dtype=np.float32)
+        top = np.argmax(probs, axis=1)
+        if self._aggregation == "max":
+            combined = probs[int(np.argmax(probs[np.arange(len(top)), top]))]
+            idx = int(np.argmax(combined))
+        elif self._aggregation == "vote":
+            combined = probs.mean(axis=0)
+            votes = np.bincount(top, minlength=probs.shape[1])
+            tied = np.flatnonzero(votes == votes.max())
+            idx = int(tied[np.argmax(combined[tied])])
+        else:
+            combined = probs.mean(axis=0)
+            idx = int(np.argmax(combined))
+        return TTAResult(
+            class_name=classes[idx],
+            confidence=float(combined[idx]),
+            probabilities=[float(p) for p in combined],
+            agreement=float(np.mean(top == idx)),
+        )
+
+    def aggregate_batch(self, probs: np.ndarray, classes: list[str], counts: list[int]) -> list[TTAResult]:
+        """Split a concatenated (sum(counts), num_classes) matrix back per frame; frame i has counts[i] rows."""
+        results = []
+        offset = 0
+        for count in counts:
+            results.append(self.aggregate(probs[offset:offset + count], classes))
+            offset += count
+        return results
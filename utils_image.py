@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import base64
 import hashlib
+import struct
 from dataclasses import dataclass
 from typing import Any
 
@@ -11,11 +12,13 @@ import numpy as np
 
 @dataclass(frozen=True)
 class ImageFeatures:
-    image_sha256: str
+    image_sha256: str | None
     color_hsv_mean: list[float]
     color_lab_mean: list[float]
     size_px_diameter: float | None
     mask_coverage: float
+    # Hex dHash/pHash of a small thumbnail, for near-duplicate detection
+    perceptual_hash: str | None = None
 
 
 def decode_data_url(data_url: str) -> bytes:
@@ -32,14 +35,91 @@ def decode_image_bytes(img_bytes: bytes) -> np.ndarray:
     return image
 
 
+# JPEG start-of-frame markers that carry the frame dimensions (C4/C8/CC are not frames)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def encoded_dimensions(img_bytes: bytes) -> tuple[int, int] | None:
+    """(width, height) read from a JPEG or PNG header without decoding pixels; None if unknown."""
+    if img_bytes[:8] == _PNG_SIGNATURE and len(img_bytes) >= 24:
+        width, height = struct.unpack(">II", img_bytes[16:24])
+        return int(width), int(height)
+
+    if img_bytes[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    n = len(img_bytes)
+    while i + 9 < n:
+        if img_bytes[i] != 0xFF:
+            i += 1
+            continue
+        marker = img_bytes[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            # Standalone markers have no length field
+            i += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", img_bytes[i + 5:i + 9])
+            return int(width), int(height)
+        (segment_length,) = struct.unpack(">H", img_bytes[i + 2:i + 4])
+        i += 2 + segment_length
+    return None
+
+
+def decode_image_for_analysis(img_bytes: bytes, max_side: int) -> tuple[np.ndarray, float]:
+    """
+    Decode an upload at (roughly) the analysis resolution instead of full size.
+
+    JPEGs are decoded with IMREAD_REDUCED_COLOR_2/4/8, picked from the header dimensions so
+    the result is never smaller than max_side on its long edge; anything still larger is
+    resized down with INTER_AREA. Returns (image, scale) where scale converts analysis
+    pixels back to original-image pixels. max_side <= 0 decodes at full resolution.
+    """
+    dims = encoded_dimensions(img_bytes) if max_side > 0 else None
+    if dims is None:
+        image = decode_image_bytes(img_bytes)
+        original_long_side = max(image.shape[:2])
+    else:
+        original_long_side = max(dims)
+        flag = cv2.IMREAD_COLOR
+        if img_bytes[:2] == b"\xff\xd8":
+            for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                    (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                if original_long_side // factor >= max_side:
+                    flag = reduced
+                    break
+        image = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), flag)
+        if image is None:
+            raise ValueError("Could not decode image")
+
+    if max_side > 0:
+        h, w = image.shape[:2]
+        long_side = max(h, w)
+        if long_side > max_side:
+            ratio = max_side / float(long_side)
+            new_size = (max(1, int(round(w * ratio))), max(1, int(round(h * ratio))))
+            image = cv2.resize(image, new_size, interpolation=cv2.INTER_AREA)
+
+    return image, original_long_side / float(max(image.shape[:2]))
+
+
 def sha256_bytes(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
-def _largest_contour_mask(image_bgr: np.ndarray) -> tuple[np.ndarray, float]:
+# Fraction of dark, low-saturation pixels above which the mold heuristic fires
+MOLD_RATIO_THRESHOLD = 0.22
+
+
+def _largest_contour_mask(image_bgr: np.ndarray, hsv: np.ndarray | None = None) -> tuple[np.ndarray, float]:
     h, w = image_bgr.shape[:2]
 
-    hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
+    if hsv is None:
+        hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
     s = hsv[:, :, 1]
     v = hsv[:, :, 2]
 
@@ -67,53 +147,89 @@ def _largest_contour_mask(image_bgr: np.ndarray) -> tuple[np.ndarray, float]:
     return mask, coverage
 
 
-def extract_features(image_bgr: np.ndarray) -> ImageFeatures:
-    h, w = image_bgr.shape[:2]
-    mask, coverage = _largest_contour_mask(image_bgr)
-
-    hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
-    lab = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2LAB)
+# Below this mask coverage the contour is treated as noise and whole-frame statistics are used
+MIN_MASK_COVERAGE = 0.01
 
-    if coverage > 0.01:
-        mask_bool = mask.astype(bool)
-        hsv_pixels = hsv[mask_bool]
-        lab_pixels = lab[mask_bool]
-    else:
-        hsv_pixels = hsv.reshape(-1, 3)
-        lab_pixels = lab.reshape(-1, 3)
 
-    hsv_mean = hsv_pixels.mean(axis=0).astype(float).tolist()
-    lab_mean = lab_pixels.mean(axis=0).astype(float).tolist()
+def _color_and_size(
+    hsv: np.ndarray, lab: np.ndarray, mask: np.ndarray, coverage: float
+) -> tuple[list[float], list[float], float | None]:
+    # cv2.mean/countNonZero reduce in place over the mask; no masked-pixel copies
+    use_mask = mask if coverage > MIN_MASK_COVERAGE else None
+    hsv_mean = [float(c) for c in cv2.mean(hsv, mask=use_mask)[:3]]
+    lab_mean = [float(c) for c in cv2.mean(lab, mask=use_mask)[:3]]
 
     size_px_diameter: float | None = None
-    if coverage > 0.01:
-        area = float(mask.sum() / 255.0)
+    if use_mask is not None:
+        area = float(cv2.countNonZero(mask))
         # Equivalent circular diameter from area
         size_px_diameter = float(np.sqrt(4.0 * area / np.pi))
 
-    # Hash for dedupe/logging (not the image bytes themselves)
-    # Caller should pass original bytes for accurate hash; here we hash a JPEG-encoded version.
-    ok, encoded = cv2.imencode(".jpg", image_bgr)
-    if not ok:
-        encoded_bytes = image_bgr.tobytes()
-    else:
-        encoded_bytes = encoded.tobytes()
+    return hsv_mean, lab_mean, size_px_diameter
+
+
+def _mold_ratio(hsv: np.ndarray) -> float:
+    # Conservative classical heuristic: share of the whole frame that is very dark and low
+    # saturation. MOLD_RATIO_THRESHOLD was tuned on this whole-frame ratio, so it is not
+    # restricted to the contour mask. One inRange + countNonZero, no boolean temporaries.
+    moldish = cv2.inRange(hsv, (0, 0, 0), (255, 84, 54))  # s < 85 and v < 55
+    return cv2.countNonZero(moldish) / float(moldish.size)
+
+
+def _bits_to_hex(bits: np.ndarray) -> str:
+    width = (bits.size + 3) // 4
+    return f"{int(''.join('1' if b else '0' for b in bits.ravel()), 2):0{width}x}"
+
+
+def dhash(image_bgr: np.ndarray, hash_size: int = 8) -> str:
+    """Difference hash: sign of horizontal gradients on a (hash_size+1) x hash_size thumbnail."""
+    gray = image_bgr if image_bgr.ndim == 2 else cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return _bits_to_hex(thumb[:, 1:] > thumb[:, :-1])
+
+
+def phash(image_bgr: np.ndarray, hash_size: int = 8, highfreq_factor: int = 4) -> str:
+    """Perceptual hash: low-frequency DCT coefficients of a small thumbnail vs their median."""
+    gray = image_bgr if image_bgr.ndim == 2 else cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+    size = hash_size * highfreq_factor
+    thumb = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(thumb)[:hash_size, :hash_size]
+    return _bits_to_hex(low > np.median(low))
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    """Number of differing bits between two hex perceptual hashes (small = near-duplicate)."""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+PERCEPTUAL_HASHES = {"dhash": dhash, "phash": phash}
+
+
+def extract_features(
+    image_bgr: np.ndarray, image_sha256: str | None = None, perceptual_hash: str | None = None
+) -> ImageFeatures:
+    """
+    Colour/size features of the largest foreground object.
+
+    image_sha256 is passed through as-is: hash the original upload bytes (sha256_bytes)
+    rather than the decoded frame. perceptual_hash ("dhash" or "phash") additionally
+    computes a thumbnail hash for near-duplicate detection.
+    """
+    hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
+    lab = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2LAB)
+    mask, coverage = _largest_contour_mask(image_bgr, hsv)
+    hsv_mean, lab_mean, size_px_diameter = _color_and_size(hsv, lab, mask, coverage)
 
     return ImageFeatures(
-        image_sha256=sha256_bytes(encoded_bytes),
+        image_sha256=image_sha256,
         color_hsv_mean=hsv_mean,
         color_lab_mean=lab_mean,
         size_px_diameter=size_px_diameter,
         mask_coverage=float(coverage),
+        perceptual_hash=PERCEPTUAL_HASHES[perceptual_hash](image_bgr) if perceptual_hash else None,
     )
 
 
-def resize_for_model(image_bgr: np.ndarray, size: int = 224) -> np.ndarray:
-    image = cv2.resize(image_bgr, (size, size), interpolation=cv2.INTER_AREA)
-    image = image.astype(np.float32) / 255.0
-    return np.expand_dims(image, axis=0)
-
-
 @dataclass(frozen=True)
 class ImageQuality:
     """Assessment of image quality for better detection feedback."""
@@ -131,9 +247,11 @@ def assess_image_quality(image_bgr: np.ndarray, mask_coverage: float) -> ImageQu
     Assess image quality to provide actionable feedback for blurry or distant images.
     This helps users understand why detection might fail and how to improve it.
     """
-    h, w = image_bgr.shape[:2]
     gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
-    
+    return _assess_quality_from_gray(gray, mask_coverage)
+
+
+def _assess_quality_from_gray(gray: np.ndarray, mask_coverage: float) -> ImageQuality:
     # Blur detection using Laplacian variance
     laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
     # Normalize blur score (typical range 0-2000+, we normalize to 0-1)
@@ -214,15 +332,79 @@ def assess_image_quality(image_bgr: np.ndarray, mask_coverage: float) -> ImageQu
     )
 
 
-def enhance_image_for_detection(image_bgr: np.ndarray) -> np.ndarray:
+@dataclass(frozen=True)
+class ImageAnalysis:
+    """Everything /predict derives from the raw frame, computed from shared intermediates."""
+    features: ImageFeatures
+    quality: ImageQuality
+    mask: np.ndarray  # uint8 0/255 mask of the largest foreground contour
+    mold_ratio: float  # share of dark, low-saturation pixels inside the mask
+
+    @property
+    def mold_flag(self) -> bool:
+        return self.mold_ratio > MOLD_RATIO_THRESHOLD
+
+
+def analyze_image(
+    image_bgr: np.ndarray, image_sha256: str, pixel_scale: float = 1.0, perceptual_hash: str | None = None
+) -> ImageAnalysis:
+    """
+    Fused single-pass analysis: converts to HSV, LAB and GRAY exactly once and derives
+    features, contour mask, quality scores and mold ratio from those shared arrays.
+    Equivalent to extract_features + assess_image_quality + the mold heuristic, but the
+    caller supplies the hash of the original upload instead of re-encoding the frame.
+
+    pixel_scale is the original/analysis size ratio from decode_image_for_analysis;
+    size_px_diameter is reported in original-image pixels. perceptual_hash ("dhash" or
+    "phash") is computed from the shared grayscale frame.
+    """
+    hsv = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2HSV)
+    lab = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2LAB)
+    gray = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2GRAY)
+
+    mask, coverage = _largest_contour_mask(image_bgr, hsv)
+    hsv_mean, lab_mean, size_px_diameter = _color_and_size(hsv, lab, mask, coverage)
+    if size_px_diameter is not None:
+        size_px_diameter *= pixel_scale
+
+    features = ImageFeatures(
+        image_sha256=image_sha256,
+        color_hsv_mean=hsv_mean,
+        color_lab_mean=lab_mean,
+        size_px_diameter=size_px_diameter,
+        mask_coverage=float(coverage),
+        perceptual_hash=PERCEPTUAL_HASHES[perceptual_hash](gray) if perceptual_hash else None,
+    )
+    return ImageAnalysis(
+        features=features,
+        quality=_assess_quality_from_gray(gray, features.mask_coverage),
+        mask=mask,
+        mold_ratio=_mold_ratio(hsv),
+    )
+
+
+# Enhancement presets: "full" = bilateral denoise + CLAHE + sharpen, "fast" drops the
+# bilateral filter (by far the most expensive step), "off" skips enhancement entirely.
+ENHANCEMENT_PRESETS = ("off", "fast", "full")
+# "always" enhances every scan; "auto" only when the quality check flags blur or low contrast.
+ENHANCEMENT_MODES = ("always", "auto")
+
+
+def enhance_image_for_detection(image_bgr: np.ndarray, preset: str = "full") -> np.ndarray:
     """
     Apply image enhancement to improve detection for blurry/distant/poor quality images.
     This preprocessing helps the model recognize Bignay even in suboptimal conditions.
     """
-    enhanced = image_bgr.copy()
+    if preset not in ENHANCEMENT_PRESETS:
+        raise ValueError(f"Unknown enhancement preset: {preset!r}")
+    if preset == "off":
+        return image_bgr
+
+    enhanced = image_bgr
     
     # 1. Denoise while preserving edges (helps with blurry images)
-    enhanced = cv2.bilateralFilter(enhanced, 9, 75, 75)
+    if preset == "full":
+        enhanced = cv2.bilateralFilter(enhanced, 9, 75, 75)
     
     # 2. Adaptive histogram equalization for better contrast
     # Convert to LAB color space for better color preservation
@@ -237,18 +419,80 @@ def enhance_image_for_detection(image_bgr: np.ndarray) -> np.ndarray:
     lab = cv2.merge([l_channel, a_channel, b_channel])
     enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
     
-    # 3. Slight sharpening to improve edge detection
+    # 3. Slight sharpening to improve edge detection (filter2D saturates to uint8)
     kernel = np.array([[-1, -1, -1],
                        [-1, 9.5, -1],
                        [-1, -1, -1]]) / 1.5
-    enhanced = cv2.filter2D(enhanced, -1, kernel)
-    
-    # Ensure values are in valid range
-    enhanced = np.clip(enhanced, 0, 255).astype(np.uint8)
-    
+    return cv2.filter2D(enhanced, -1, kernel)
+
+
+def needs_enhancement(quality: ImageQuality) -> bool:
+    """True when assess_image_quality flagged blur or low contrast (same thresholds as its issues)."""
+    return quality.blur_score < 0.5 or quality.contrast_score < 0.3
+
+
+def enhancement_applies(quality: ImageQuality, preset: str = "full", mode: str = "always") -> bool:
+    """Whether the preset/mode combination enhances a scan of this quality."""
+    if mode not in ENHANCEMENT_MODES:
+        raise ValueError(f"Unknown enhancement mode: {mode!r}")
+    return preset != "off" and (mode == "always" or needs_enhancement(quality))
+
+
+def enhanced_model_input(
+    image_bgr: np.ndarray,
+    preset: str = "full",
+    working_size: int = 224,
+    size: int = 224,
+    resized: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Enhanced ``size x size`` uint8 copy of the frame. Enhancement runs at ``working_size``:
+    equal to ``size`` it works on the resized model input (``resized`` if the caller has
+    it), a larger value downscales the long side to it first, 0 uses the full frame.
+    """
+    if working_size == size:
+        source = resized if resized is not None else cv2.resize(image_bgr, (size, size), interpolation=cv2.INTER_AREA)
+    else:
+        source = image_bgr
+        h, w = image_bgr.shape[:2]
+        long_side = max(h, w)
+        if 0 < working_size < long_side:
+            ratio = working_size / float(long_side)
+            source = cv2.resize(
+                image_bgr,
+                (max(1, int(round(w * ratio))), max(1, int(round(h * ratio)))),
+                interpolation=cv2.INTER_AREA,
+            )
+    enhanced = enhance_image_for_detection(source, preset)
+    if enhanced.shape[:2] != (size, size):
+        enhanced = cv2.resize(enhanced, (size, size), interpolation=cv2.INTER_AREA)
     return enhanced
 
 
+def prepare_model_inputs(
+    image_bgr: np.ndarray,
+    quality: ImageQuality,
+    preset: str = "full",
+    mode: str = "always",
+    working_size: int = 224,
+    size: int = 224,
+) -> tuple[np.ndarray, str]:
+    """
+    Model input batch for a scan: the original frame plus, when enhancement applies,
+    an enhanced copy. Returns ``(tensors, enhancement)`` where tensors is
+    ``(1 or 2, size, size, 3)`` float32 and enhancement is the preset used, "skipped"
+    (auto mode, good quality) or "off".
+    """
+    original = cv2.resize(image_bgr, (size, size), interpolation=cv2.INTER_AREA)
+    if enhancement_applies(quality, preset, mode):
+        frames = [original, enhanced_model_input(image_bgr, preset, working_size, size, resized=original)]
+        enhancement = preset
+    else:
+        frames = [original]
+        enhancement = "off" if preset == "off" else "skipped"
+    return np.stack(frames).astype(np.float32) / 255.0, enhancement
+
+
 def safe_json(obj: Any) -> Any:
     if isinstance(obj, (str, int, float, bool)) or obj is None:
         return obj